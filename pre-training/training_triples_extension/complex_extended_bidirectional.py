@@ -197,7 +197,8 @@ def process_recommendations(
 
 def create_artificial_triples(
     dataset,
-    probability_threshold: float = None
+    probability_threshold: float = None,
+    max_recommendations: int = None
 ) -> Tuple[List[torch.Tensor], int]:
     """
     Create artificial triples based on recommendations using both incoming and outgoing properties.
@@ -205,6 +206,7 @@ def create_artificial_triples(
     Args:
         dataset: PyKEEN dataset
         probability_threshold: Threshold for recommendation filtering
+        max_recommendations: Maximum number of recommendations per entity
         
     Returns:
         Tuple of (list of new triples, next entity ID)
@@ -293,7 +295,11 @@ def create_artificial_triples(
         
         print(f"\nGetting recommendations for entity {entity_id} (has {len(property_list)} total properties)")
         recommendations = get_recommendations(property_list)
-        filtered_recommendations = process_recommendations(recommendations, threshold=probability_threshold)
+        filtered_recommendations = process_recommendations(
+            recommendations,
+            threshold=probability_threshold,
+            max_recommendations=max_recommendations
+        )
         # Limit recommendations to the number of original properties (both incoming and outgoing)-
         # you can skip that if no needed
         filtered_recommendations = filtered_recommendations[:len(property_list)]
@@ -397,6 +403,7 @@ def train_extended_model(
     embedding_dim=None, 
     max_epochs=None,
     probability_threshold=None,
+    max_recommendations=None,
     sampling_rate=None
 ):
     """
@@ -410,6 +417,7 @@ def train_extended_model(
         embedding_dim: Dimension of entity/relation embeddings
         max_epochs: Maximum number of training epochs
         probability_threshold: Threshold for recommendation filtering
+        max_recommendations: Maximum number of recommendations per entity
         sampling_rate: Rate at which to sample from new triples
     """
     print("\n=== Training Extended ComplEx Model with Bidirectional Properties ===")
@@ -442,7 +450,8 @@ def train_extended_model(
     # Create artificial triples
     new_triples, next_entity_id = create_artificial_triples(
         dataset,
-        probability_threshold=probability_threshold
+        probability_threshold=probability_threshold,
+        max_recommendations=max_recommendations
     )
     
     
@@ -5,42 +5,161 @@ Focuses on probability_threshold, max_recommendations, and sampling_rate.
 The custom implementation is for the bidirectional model.
 """
 
+import io
 import os
+import sys
+import subprocess
 import argparse
 import itertools
-import numpy as np
 from datetime import datetime
 import json
-import torch
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import pandas as pd
+import logging
+import math
 import re
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
 
-# Try importing wandb
-try:
-    import wandb
-    WANDB_AVAILABLE = True
-except ImportError:
-    WANDB_AVAILABLE = False
-    print("Warning: wandb not installed. Results will not be logged to Weights & Biases.")
+# Heavy dependencies (numpy, pandas, matplotlib, wandb) are imported inside the
+# functions that use them, so that --help and the driver process start quickly
 
-# Import train_extended_model functionality
-import complex_extended_bidirectional as train_extended_model
-from complex_extended_bidirectional import get_config
 
+# Set up logging; per-trial metric dumps are only shown at DEBUG level
+logging.basicConfig(
+    level=os.environ.get("HPSEARCH_LOGLEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Directory of this script, used to locate run_one_combo.py
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# File written by run_one_combo.py with the metrics of a combination
+COMBO_METRICS_FILENAME = 'direct_metrics.json'
 
 # Define default hyperparameter search grid. Change as needed
 DEFAULT_PROBABILITY_THRESHOLDS = [0.1, 0.3, 0.5, 0.7, 0.9]
 DEFAULT_MAX_RECOMMENDATIONS = [10]
 DEFAULT_SAMPLING_RATES = [0.0]
 
+# Metrics collected for every combination
+METRIC_KEYS = ('hits@1', 'hits@3', 'hits@5', 'hits@10', 'mean_rank', 'mrr')
+LOWER_IS_BETTER = ('mean_rank',)
+
+# Number formats of the text summary table columns
+TABLE_FORMATS = {
+    'probability_threshold': '{:.1f}',
+    'max_recommendations': '{:d}',
+    'sampling_rate': '{:.1f}',
+    'new_triples': '{:,.0f}',
+    'hits@1': '{:.4f}',
+    'hits@3': '{:.4f}',
+    'hits@5': '{:.4f}',
+    'hits@10': '{:.4f}',
+    'mean_rank': '{:.1f}',
+    'mrr': '{:.6f}',
+}
+
+# (metric, label, number format, colormap, file prefix) of the per-sampling-rate heatmaps
+HEATMAPS = [
+    ('hits@10', 'Hits@10', '.4f', 'viridis', 'hits'),
+    ('mean_rank', 'Mean Rank', '.1f', 'viridis_r', 'rank'),  # reversed colormap as lower is better
+    ('mrr', 'MRR', '.6f', 'viridis', 'mrr'),
+]
+
+# Columns of the text summary table and their headers
+TABLE_HEADERS = {
+    'probability_threshold': 'Prob',
+    'max_recommendations': 'MaxRec',
+    'sampling_rate': 'Samp',
+    'new_triples': 'New Triples',
+    'triples_increase_percent': 'Triples %',
+    'hits@1': 'Hits@1',
+    'hits@3': 'Hits@3',
+    'hits@5': 'Hits@5',
+    'hits@10': 'Hits@10',
+    'mean_rank': 'MeanRank',
+    'mrr': 'MRR',
+}
+
+# (metric, description, number format) for the best-combination reports
+BEST_COMBO_REPORTS = [
+    ('hits@1', "Best for Hits@1", ".4f"),
+    ('hits@3', "Best for Hits@3", ".4f"),
+    ('hits@5', "Best for Hits@5", ".4f"),
+    ('hits@10', "Best for Hits@10", ".4f"),
+    ('mean_rank', "Best for Mean Rank", ".1f"),
+    ('mrr', "Best for MRR", ".6f"),
+]
+
 
 # Default wandb configuration
 WANDB_PROJECT = "recommender-server" 
 WANDB_ENTITY = "slaw-mecz-vrije-universiteit-amsterdam"
 
+@dataclass(frozen=True)
+class TrialResult:
+    """Outcome of training and evaluating a single hyperparameter combination."""
+    probability_threshold: float
+    max_recommendations: int
+    sampling_rate: float
+    hits_at_1: Optional[float]
+    hits_at_3: Optional[float]
+    hits_at_5: Optional[float]
+    hits_at_10: Optional[float]
+    mean_rank: Optional[float]
+    mrr: Optional[float]
+    original_triples: Optional[int]
+    new_triples: Optional[int]
+    total_triples: Optional[int]
+    triples_increase_percent: Optional[float]
+    original_entities: Optional[int]
+    new_entities: Optional[int]
+    total_entities: Optional[int]
+    output_dir: str
+
+    def as_record(self) -> Dict[str, Any]:
+        """Return the result keyed by the column names of the results table."""
+        hits = {f"hits@{k}": getattr(self, f"hits_at_{k}") for k in (1, 3, 5, 10)}
+        return {
+            "probability_threshold": self.probability_threshold,
+            "max_recommendations": self.max_recommendations,
+            "sampling_rate": self.sampling_rate,
+            **hits,
+            "mean_rank": self.mean_rank,
+            "mrr": self.mrr,
+            # Combined metrics kept for compatibility with earlier result files
+            **{f"combined_{k}": v for k, v in hits.items()},
+            "combined_mean_rank": self.mean_rank,
+            "combined_mean_reciprocal_rank": self.mrr,
+            "original_triples": self.original_triples,
+            "new_triples": self.new_triples,
+            "total_triples": self.total_triples,
+            "triples_increase_percent": self.triples_increase_percent,
+            "original_entities": self.original_entities,
+            "new_entities": self.new_entities,
+            "total_entities": self.total_entities,
+            "output_dir": self.output_dir,
+        }
+
+def _import_wandb():
+    """Import wandb on demand, returning None if it is not installed."""
+    try:
+        import wandb
+        return wandb
+    except ImportError:
+        print("Warning: wandb not installed. Results will not be logged to Weights & Biases.")
+        return None
+
+def _is_missing(value):
+    """Scalar replacement for pd.isna on metric values."""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def _json_default(value):
+    """Serialize numpy scalars and other non-JSON values in trial records."""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
 def run_hyperparameter_search(
     baseline_dir,
     output_dir="models/hyperparameter_search", #change as needed
@@ -73,6 +192,8 @@ def run_hyperparameter_search(
     Returns:
         DataFrame with results for all hyperparameter combinations
     """
+    import pandas as pd
+    
     # Initialize hyperparameter grids with defaults if not provided
     probability_thresholds = probability_thresholds or DEFAULT_PROBABILITY_THRESHOLDS
     max_recommendations = max_recommendations or DEFAULT_MAX_RECOMMENDATIONS
@@ -88,13 +209,18 @@ def run_hyperparameter_search(
     # Limit the number of combinations if specified
     if max_combinations and max_combinations < len(hyperparameter_grid):
         print(f"Limiting to {max_combinations} combinations out of {len(hyperparameter_grid)} possible combinations")
+        import numpy as np
         np.random.seed(42)  # For reproducibility
         hyperparameter_grid = np.random.choice(hyperparameter_grid, max_combinations, replace=False)
     
     # Initialize wandb flag
     wandb_initialized = False
-    if not use_wandb or not WANDB_AVAILABLE:
+    wandb = _import_wandb() if use_wandb else None
+    if wandb is None:
         print("Weights & Biases logging disabled")
+    else:
+        # Only needed for the defaults recorded in the wandb run config
+        from complex_extended_bidirectional import get_config
     
     # Create main output directory
     os.makedirs(output_dir, exist_ok=True)
@@ -103,8 +229,25 @@ def run_hyperparameter_search(
     plots_dir = os.path.join(output_dir, "plots")
     os.makedirs(plots_dir, exist_ok=True)
     
-    # Prepare results storage
-    results = []
+    # Completed trials are appended to a JSON-lines file as they finish, so a
+    # crash keeps the finished ones and a re-run can skip them
+    results_path = os.path.join(output_dir, "trials.jsonl")
+    completed_dirs = set()
+    if os.path.exists(results_path):
+        with open(results_path, 'r') as f:
+            completed_dirs = {json.loads(line)['output_dir'] for line in f if line.strip()}
+        print(f"Found {len(completed_dirs)} completed combinations in {results_path}")
+    
+    # Arguments shared by every combination are bound once
+    base_cmd = [sys.executable, os.path.join(SCRIPT_DIR, 'run_one_combo.py')]
+    if baseline_dir:
+        base_cmd += ['--baseline-dir', baseline_dir]
+    if dataset_name:
+        base_cmd += ['--dataset', dataset_name]
+    if model_type:
+        base_cmd += ['--model', model_type]
+    if embedding_dim:
+        base_cmd += ['--embedding-dim', str(embedding_dim)]
     
     # Process each hyperparameter combination
     print(f"\n=== Running Hyperparameter Search with {len(hyperparameter_grid)} Combinations ===\n")
@@ -114,11 +257,15 @@ def run_hyperparameter_search(
         combo_name = f"prob{prob_threshold}_maxrec{max_recs}_samp{samp_rate}"
         combo_dir = os.path.join(output_dir, combo_name)
         
+        if combo_dir in completed_dirs:
+            print(f"\n[{i+1}/{len(hyperparameter_grid)}] Skipping {combo_name} (already completed)")
+            continue
+        
         print(f"\n[{i+1}/{len(hyperparameter_grid)}] Testing: prob_threshold={prob_threshold}, "
               f"max_recommendations={max_recs}, sampling_rate={samp_rate}")
         
         # Create a separate wandb run for each combination
-        if use_wandb and WANDB_AVAILABLE:
+        if wandb is not None:
             if wandb_initialized:
                 wandb.finish()  # End previous run if any
             
@@ -143,367 +290,307 @@ def run_hyperparameter_search(
             )
             wandb_initialized = True
         
-        # Update the max_recommendations and probability_threshold in environment
-        os.environ["PROBABILITY_THRESHOLD"] = str(prob_threshold)
-        os.environ["MAX_RECOMMENDATIONS"] = str(max_recs)
-        os.environ["SAMPLING_RATE"] = str(samp_rate)
-        
-        # Configure the training
-        # Override the default configs with our test values
-        orig_configs = {}
-        
         # Train the extended model with these hyperparameters
         try:
-            # Save original configs for reference
-            orig_configs['probability_threshold'] = get_config('probability_threshold')
-            orig_configs['max_recommendations'] = get_config('max_recommendations')
-            orig_configs['sampling_rate'] = get_config('sampling_rate')
+            # Train the model in a fresh process so that its GPU memory is
+            # released before the next combination starts
+            metrics_path = os.path.join(combo_dir, COMBO_METRICS_FILENAME)
+            if os.path.exists(metrics_path):
+                os.remove(metrics_path)
             
-            # Set up specialized configs for this run
-            configs = {
-                'probability_threshold': prob_threshold,
-                'max_recommendations': max_recs,
-                'sampling_rate': samp_rate
-            }
+            cmd = base_cmd + [
+                '--output-dir', combo_dir,
+                '--probability-threshold', str(prob_threshold),
+                '--max-recommendations', str(max_recs),
+                '--sampling-rate', str(samp_rate),
+            ]
             
-            # Copy original get_config function
-            original_get_config = get_config
+            completed = subprocess.run(cmd, check=False)
+            if completed.returncode != 0 or not os.path.exists(metrics_path):
+                raise RuntimeError(f"training process exited with code {completed.returncode}")
             
-            # Define a new get_config function that uses our configs
-            def patched_get_config(key, default=None):
-                if key in configs:
-                    return configs[key]
-                return original_get_config(key, default)
+            with open(metrics_path, 'r') as f:
+                direct_metrics = json.load(f)
             
-            # Train model with hyperparameters
-            try:
-                # Monkey patch the get_config function
-                # This is a bit of a hack, but allows us to override configs without changing code
-                #import train_extended_model
-                #train_extended_model.get_config = patched_get_config
-                
-                # Train the model
-                model, model_dir, direct_metrics = train_extended_model.train_extended_model(
-                    output_dir=combo_dir,
-                    baseline_model_dir=baseline_dir,
-                    dataset_name=dataset_name,
-                    model_type=model_type,
-                    embedding_dim=embedding_dim,
-                    probability_threshold=prob_threshold,
-                    sampling_rate=samp_rate
-                )
+            # Get metrics from the direct metrics returned by PyKEEN
+            metrics = {}
+            triples_info = {}
+            
+            if direct_metrics:
+                # The complex_extended_bidirectional.py returns hierarchical metrics with optimistic/realistic/pessimistic modes
+                logger.debug("Using processed metrics from complex_extended_bidirectional:")
                 
-                # Get metrics from the direct metrics returned by PyKEEN
-                metrics = {}
-                triples_info = {}
+                logger.debug(f"Available metrics keys: {list(direct_metrics.keys())}")
                 
-                if direct_metrics:
-                    # The complex_extended_bidirectional.py returns hierarchical metrics with optimistic/realistic/pessimistic modes
-                    print("\nUsing processed metrics from complex_extended_bidirectional:")
+                # Check for hierarchical metrics structure (new PyKEEN format)
+                hierarchical_metrics = False
+                if 'head' in direct_metrics and 'tail' in direct_metrics and 'both' in direct_metrics:
+                    hierarchical_metrics = True
+                    logger.debug("Detected hierarchical metrics structure (head/tail/both)")
                     
-                    print(f"Available metrics keys: {list(direct_metrics.keys())}")
+                    # Extract metrics from the 'both' section which contains averaged metrics
+                    both_metrics = direct_metrics.get('both', {})
+                    logger.debug(f"Available modes in 'both' section: {list(both_metrics.keys())}")
                     
-                    # Check for hierarchical metrics structure (new PyKEEN format)
-                    hierarchical_metrics = False
-                    if 'head' in direct_metrics and 'tail' in direct_metrics and 'both' in direct_metrics:
-                        hierarchical_metrics = True
-                        print("Detected hierarchical metrics structure (head/tail/both)")
+                    # Get the evaluation mode - typically 'optimistic' or 'realistic'
+                    eval_mode = 'optimistic'
+                    if eval_mode in both_metrics:
+                        mode_metrics = both_metrics[eval_mode]
+                        logger.debug(f"Using '{eval_mode}' evaluation mode with metrics: {list(mode_metrics.keys())}")
                         
-                        # Extract metrics from the 'both' section which contains averaged metrics
-                        both_metrics = direct_metrics.get('both', {})
-                        print(f"Available modes in 'both' section: {list(both_metrics.keys())}")
-                        
-                        # Get the evaluation mode - typically 'optimistic' or 'realistic'
-                        eval_mode = 'optimistic'
-                        if eval_mode in both_metrics:
-                            mode_metrics = both_metrics[eval_mode]
-                            print(f"Using '{eval_mode}' evaluation mode with metrics: {list(mode_metrics.keys())}")
-                            
-                            # Extract MRR (inverse_harmonic_mean_rank)
-                            if 'inverse_harmonic_mean_rank' in mode_metrics:
-                                value = mode_metrics['inverse_harmonic_mean_rank']
-                                metrics["mrr"] = value
-                                if pd.isna(value):
-                                    print(f"  WARNING: MRR from 'both.{eval_mode}' is NaN")
-                                else:
-                                    print(f"  mrr: {value}")
-                            
-                            # Extract mean_rank
-                            if 'arithmetic_mean_rank' in mode_metrics:
-                                value = mode_metrics['arithmetic_mean_rank']
-                                metrics["mean_rank"] = value
-                                if pd.isna(value):
-                                    print(f"  WARNING: mean_rank from 'both.{eval_mode}' is NaN")
-                                else:
-                                    print(f"  mean_rank: {value}")
-                            
-                            # Extract hits@k if available
-                            for k in [1, 3, 5, 10]:
-                                key = f'hits_at_{k}'
-                                if key in mode_metrics:
-                                    value = mode_metrics[key]
-                                    metrics[f"hits@{k}"] = value
-                                    if pd.isna(value):
-                                        print(f"  WARNING: hits@{k} from 'both.{eval_mode}' is NaN")
-                                    else:
-                                        print(f"  hits@{k}: {value}")
-                                else:
-                                    print(f"  WARNING: hits@{k} not found in 'both.{eval_mode}'")
-                        else:
-                            print(f"  WARNING: '{eval_mode}' evaluation mode not found in 'both' section")
-                            print(f"  Available modes: {list(both_metrics.keys())}")
-                    # Check for optimistic/realistic/pessimistic structure (complex_extended_bidirectional format)
-                    elif 'optimistic' in direct_metrics and 'realistic' in direct_metrics:
-                        hierarchical_metrics = True
-                        print("Detected optimistic/realistic/pessimistic metrics structure")
+                        # Extract MRR (inverse_harmonic_mean_rank)
+                        if 'inverse_harmonic_mean_rank' in mode_metrics:
+                            value = mode_metrics['inverse_harmonic_mean_rank']
+                            metrics["mrr"] = value
+                            if _is_missing(value):
+                                logger.warning(f"MRR from 'both.{eval_mode}' is NaN")
+                            else:
+                                logger.info(f"mrr: {value}")
                         
-                        # Use realistic metrics by default
-                        eval_mode = 'realistic'
-                        if eval_mode in direct_metrics:
-                            mode_metrics = direct_metrics[eval_mode]
-                            print(f"Using '{eval_mode}' evaluation mode with metrics: {list(mode_metrics.keys())}")
-                            
-                            # Extract hits@k metrics
-                            for k in [1, 3, 5, 10]:
-                                key = f'hits_at_{k}'
-                                if key in mode_metrics:
-                                    value = mode_metrics[key]
-                                    metrics[f"hits@{k}"] = value
-                                    if pd.isna(value):
-                                        print(f"  WARNING: hits@{k} from '{eval_mode}' is NaN")
-                                    else:
-                                        print(f"  hits@{k}: {value}")
-                                else:
-                                    print(f"  WARNING: hits@{k} not found in '{eval_mode}'")
-                            
-                            # Extract mean rank (arithmetic_mean_rank)
-                            if 'arithmetic_mean_rank' in mode_metrics:
-                                value = mode_metrics['arithmetic_mean_rank']
-                                metrics["mean_rank"] = value
-                                if pd.isna(value):
-                                    print(f"  WARNING: mean_rank from '{eval_mode}' is NaN")
-                                else:
-                                    print(f"  mean_rank: {value}")
+                        # Extract mean_rank
+                        if 'arithmetic_mean_rank' in mode_metrics:
+                            value = mode_metrics['arithmetic_mean_rank']
+                            metrics["mean_rank"] = value
+                            if _is_missing(value):
+                                logger.warning(f"mean_rank from 'both.{eval_mode}' is NaN")
                             else:
-                                print(f"  WARNING: arithmetic_mean_rank not found in '{eval_mode}'")
-                            
-                            # Extract MRR (inverse_harmonic_mean_rank)
-                            if 'inverse_harmonic_mean_rank' in mode_metrics:
-                                value = mode_metrics['inverse_harmonic_mean_rank']
-                                metrics["mrr"] = value
-                                if pd.isna(value):
-                                    print(f"  WARNING: MRR from '{eval_mode}' is NaN")
+                                logger.info(f"mean_rank: {value}")
+                        
+                        # Extract hits@k if available
+                        for k in [1, 3, 5, 10]:
+                            key = f'hits_at_{k}'
+                            if key in mode_metrics:
+                                value = mode_metrics[key]
+                                metrics[f"hits@{k}"] = value
+                                if _is_missing(value):
+                                    logger.warning(f"hits@{k} from 'both.{eval_mode}' is NaN")
                                 else:
-                                    print(f"  mrr: {value}")
+                                    logger.info(f"hits@{k}: {value}")
                             else:
-                                print(f"  WARNING: inverse_harmonic_mean_rank not found in '{eval_mode}'")
-                        else:
-                            print(f"  WARNING: '{eval_mode}' evaluation mode not found")
-                            print(f"  Available modes: {list(direct_metrics.keys())}")
+                                logger.warning(f"hits@{k} not found in 'both.{eval_mode}'")
                     else:
-                        # Original flat metrics format - extract hits@k
+                        logger.warning(f"'{eval_mode}' evaluation mode not found in 'both' section")
+                        logger.debug(f"Available modes: {list(both_metrics.keys())}")
+                # Check for optimistic/realistic/pessimistic structure (complex_extended_bidirectional format)
+                elif 'optimistic' in direct_metrics and 'realistic' in direct_metrics:
+                    hierarchical_metrics = True
+                    logger.debug("Detected optimistic/realistic/pessimistic metrics structure")
+                    
+                    # Use realistic metrics by default
+                    eval_mode = 'realistic'
+                    if eval_mode in direct_metrics:
+                        mode_metrics = direct_metrics[eval_mode]
+                        logger.debug(f"Using '{eval_mode}' evaluation mode with metrics: {list(mode_metrics.keys())}")
+                        
+                        # Extract hits@k metrics
                         for k in [1, 3, 5, 10]:
                             key = f'hits_at_{k}'
-                            if key in direct_metrics:
-                                value = direct_metrics[key]
+                            if key in mode_metrics:
+                                value = mode_metrics[key]
                                 metrics[f"hits@{k}"] = value
-                                if pd.isna(value):
-                                    print(f"  WARNING: hits@{k} is NaN")
+                                if _is_missing(value):
+                                    logger.warning(f"hits@{k} from '{eval_mode}' is NaN")
                                 else:
-                                    print(f"  hits@{k}: {value}")
+                                    logger.info(f"hits@{k}: {value}")
                             else:
-                                print(f"  WARNING: hits@{k} metric (key '{key}') not found")
+                                logger.warning(f"hits@{k} not found in '{eval_mode}'")
                         
-                        # Extract mean rank
-                        if 'mean_rank' in direct_metrics:
-                            value = direct_metrics['mean_rank']
+                        # Extract mean rank (arithmetic_mean_rank)
+                        if 'arithmetic_mean_rank' in mode_metrics:
+                            value = mode_metrics['arithmetic_mean_rank']
                             metrics["mean_rank"] = value
-                            if pd.isna(value):
-                                print(f"  WARNING: mean_rank is NaN")
+                            if _is_missing(value):
+                                logger.warning(f"mean_rank from '{eval_mode}' is NaN")
                             else:
-                                print(f"  mean_rank: {value}")
+                                logger.info(f"mean_rank: {value}")
                         else:
-                            # Check for alternative keys
-                            alt_keys = [k for k in direct_metrics.keys() if "rank" in k.lower() and "mean" in k.lower()]
-                            if alt_keys:
-                                print(f"  Using alternative mean rank key: {alt_keys[0]}")
-                                value = direct_metrics[alt_keys[0]]
-                                metrics["mean_rank"] = value
-                                print(f"  mean_rank: {value}")
-                            else:
-                                print(f"  WARNING: mean_rank metric not found")
+                            logger.warning(f"arithmetic_mean_rank not found in '{eval_mode}'")
                         
-                        # Extract MRR
-                        mrr_found = False
-                        if 'inverse_harmonic_mean_rank' in direct_metrics:
-                            value = direct_metrics['inverse_harmonic_mean_rank']
+                        # Extract MRR (inverse_harmonic_mean_rank)
+                        if 'inverse_harmonic_mean_rank' in mode_metrics:
+                            value = mode_metrics['inverse_harmonic_mean_rank']
                             metrics["mrr"] = value
-                            mrr_found = True
-                            if pd.isna(value):
-                                print(f"  WARNING: MRR (inverse_harmonic_mean_rank) is NaN")
+                            if _is_missing(value):
+                                logger.warning(f"MRR from '{eval_mode}' is NaN")
                             else:
-                                print(f"  mrr: {value}")
-                        elif 'mean_reciprocal_rank' in direct_metrics:
-                            value = direct_metrics['mean_reciprocal_rank']
-                            metrics["mrr"] = value
-                            mrr_found = True
-                            if pd.isna(value):
-                                print(f"  WARNING: MRR (mean_reciprocal_rank) is NaN")
-                            else:
-                                print(f"  mrr: {value}")
-                        
-                        if not mrr_found:
-                            print(f"  WARNING: MRR metric not found")
-                    
-                    # Print all available metrics for debugging
-                    print("\nAll available metrics from complex_extended_bidirectional:")
-                    for key, value in direct_metrics.items():
-                        if isinstance(value, dict):
-                            print(f"  {key}: <dict with {len(value)} items>")
+                                logger.info(f"mrr: {value}")
                         else:
-                            value_status = "NaN" if pd.isna(value) else str(value)
-                            print(f"  {key}: {value_status}")
-                else:
-                    print("WARNING: No metrics available from complex_extended_bidirectional results")
-                    print("This could indicate that the evaluation did not complete successfully.")
-                    print("Check the training log for errors or exceptions during evaluation.")
-                
-                # Still extract triples information from metrics.txt
-                metrics_file = os.path.join(combo_dir, 'metrics.txt')
-                if os.path.exists(metrics_file):
-                    try:
-                        with open(metrics_file, 'r') as f:
-                            metrics_text = f.read()
-                            
-                            # Extract triples information
-                            original_triples_match = re.search(r"Original training triples: ([\d,]+)", metrics_text)
-                            if original_triples_match:
-                                original_triples = int(original_triples_match.group(1).replace(',', ''))
-                                triples_info["original_triples"] = original_triples
-                            
-                            new_triples_match = re.search(r"New triples added: ([\d,]+)", metrics_text)
-                            if new_triples_match:
-                                new_triples = int(new_triples_match.group(1).replace(',', ''))
-                                triples_info["new_triples"] = new_triples
-                            
-                            total_triples_match = re.search(r"Total triples: ([\d,]+)", metrics_text)
-                            if total_triples_match:
-                                total_triples = int(total_triples_match.group(1).replace(',', ''))
-                                triples_info["total_triples"] = total_triples
-                            
-                            # Check for entity information
-                            original_entities_match = re.search(r"Original entities: ([\d,]+)", metrics_text)
-                            if original_entities_match:
-                                original_entities = int(original_entities_match.group(1).replace(',', ''))
-                                triples_info["original_entities"] = original_entities
-                            
-                            new_entities_match = re.search(r"New entities: ([\d,]+)", metrics_text)
-                            if new_entities_match:
-                                new_entities = int(new_entities_match.group(1).replace(',', ''))
-                                triples_info["new_entities"] = new_entities
-                            
-                            total_entities_match = re.search(r"Total entities: ([\d,]+)", metrics_text)
-                            if total_entities_match:
-                                total_entities = int(total_entities_match.group(1).replace(',', ''))
-                                triples_info["total_entities"] = total_entities
-                            
-                            print("\nExtracted triples information:")
-                            for key, value in triples_info.items():
-                                print(f"  {key}: {value:,}")
-                    
-                    except Exception as e:
-                        print(f"Error processing metrics file {metrics_file}: {str(e)}")
+                            logger.warning(f"inverse_harmonic_mean_rank not found in '{eval_mode}'")
+                    else:
+                        logger.warning(f"'{eval_mode}' evaluation mode not found")
+                        logger.debug(f"Available modes: {list(direct_metrics.keys())}")
                 else:
-                    print(f"Warning: Metrics file not found at {metrics_file}")
-                
-                # Set the combined metrics for compatibility 
-                metrics["combined_hits@1"] = metrics.get("hits@1")
-                metrics["combined_hits@3"] = metrics.get("hits@3")
-                metrics["combined_hits@5"] = metrics.get("hits@5")
-                metrics["combined_hits@10"] = metrics.get("hits@10")
-                metrics["combined_mean_rank"] = metrics.get("mean_rank")
-                metrics["combined_mean_reciprocal_rank"] = metrics.get("mrr")
-                
-                # Store the results
-                result_record = {
-                    "probability_threshold": prob_threshold,
-                    "max_recommendations": max_recs,
-                    "sampling_rate": samp_rate,
-                    "hits@1": metrics.get("hits@1"),
-                    "hits@3": metrics.get("hits@3"),
-                    "hits@5": metrics.get("hits@5"),
-                    "hits@10": metrics.get("hits@10"),
-                    "mean_rank": metrics.get("mean_rank"),
-                    "mrr": metrics.get("mrr"),
-                    "combined_hits@1": metrics.get("combined_hits@1"),
-                    "combined_hits@3": metrics.get("combined_hits@3"),
-                    "combined_hits@5": metrics.get("combined_hits@5"),
-                    "combined_hits@10": metrics.get("combined_hits@10"),
-                    "combined_mean_rank": metrics.get("combined_mean_rank"),
-                    "combined_mean_reciprocal_rank": metrics.get("combined_mean_reciprocal_rank"),
-                    "original_triples": triples_info.get("original_triples"),
-                    "new_triples": triples_info.get("new_triples"),
-                    "total_triples": triples_info.get("total_triples"),
-                    "triples_increase_percent": (triples_info.get("new_triples", 0) / triples_info.get("original_triples", 1) * 100) if triples_info.get("original_triples") else None,
-                    "original_entities": triples_info.get("original_entities"),
-                    "new_entities": triples_info.get("new_entities"),
-                    "total_entities": triples_info.get("total_entities"),
-                    "output_dir": combo_dir
-                }
-                results.append(result_record)
-                
-                # Log result to wandb
-                if wandb_initialized:
-                    # Create a dict of metrics, filtering out NaN values
-                    wandb_metrics = {
-                        'probability_threshold': prob_threshold,
-                        'max_recommendations': max_recs,
-                        'sampling_rate': samp_rate,
-                    }
+                    # Original flat metrics format - extract hits@k
+                    for k in [1, 3, 5, 10]:
+                        key = f'hits_at_{k}'
+                        if key in direct_metrics:
+                            value = direct_metrics[key]
+                            metrics[f"hits@{k}"] = value
+                            if _is_missing(value):
+                                logger.warning(f"hits@{k} is NaN")
+                            else:
+                                logger.info(f"hits@{k}: {value}")
+                        else:
+                            logger.warning(f"hits@{k} metric (key '{key}') not found")
                     
-                    # Add metrics conditionally, handling NaN
-                    metric_pairs = [
-                        ('combined_hits@1', metrics.get('hits@1')),
-                        ('combined_hits@3', metrics.get('hits@3')),
-                        ('combined_hits@5', metrics.get('hits@5')),
-                        ('combined_hits@10', metrics.get('hits@10')),
-                        ('combined_mean_rank', metrics.get('mean_rank')),
-                        ('combined_mrr', metrics.get('mrr')),
-                        ('combined_mean_reciprocal_rank', metrics.get('mrr')),
-                        ('hits@1', metrics.get('hits@1')),
-                        ('hits@3', metrics.get('hits@3')),
-                        ('hits@5', metrics.get('hits@5')),
-                        ('hits@10', metrics.get('hits@10')),
-                        ('mean_rank', metrics.get('mean_rank')),
-                        ('mrr', metrics.get('mrr')),
-                        ('mean_reciprocal_rank', metrics.get('mrr')),
-                        ('combo_name', combo_name)
-                    ]
+                    # Extract mean rank
+                    if 'mean_rank' in direct_metrics:
+                        value = direct_metrics['mean_rank']
+                        metrics["mean_rank"] = value
+                        if _is_missing(value):
+                            logger.warning("mean_rank is NaN")
+                        else:
+                            logger.info(f"mean_rank: {value}")
+                    else:
+                        # Check for alternative keys
+                        alt_keys = [k for k in direct_metrics.keys() if "rank" in k.lower() and "mean" in k.lower()]
+                        if alt_keys:
+                            logger.info(f"Using alternative mean rank key: {alt_keys[0]}")
+                            value = direct_metrics[alt_keys[0]]
+                            metrics["mean_rank"] = value
+                            logger.info(f"mean_rank: {value}")
+                        else:
+                            logger.warning("mean_rank metric not found")
                     
-                    # Only add non-NaN metrics to wandb log
-                    for key, value in metric_pairs:
-                        if value is not None and not pd.isna(value):
-                            wandb_metrics[key] = value
+                    # Extract MRR
+                    mrr_found = False
+                    if 'inverse_harmonic_mean_rank' in direct_metrics:
+                        value = direct_metrics['inverse_harmonic_mean_rank']
+                        metrics["mrr"] = value
+                        mrr_found = True
+                        if _is_missing(value):
+                            logger.warning("MRR (inverse_harmonic_mean_rank) is NaN")
                         else:
-                            # Log a message about the missing metric
-                            print(f"Warning: Not logging {key} to wandb because it's None or NaN")
+                            logger.info(f"mrr: {value}")
+                    elif 'mean_reciprocal_rank' in direct_metrics:
+                        value = direct_metrics['mean_reciprocal_rank']
+                        metrics["mrr"] = value
+                        mrr_found = True
+                        if _is_missing(value):
+                            logger.warning("MRR (mean_reciprocal_rank) is NaN")
+                        else:
+                            logger.info(f"mrr: {value}")
                     
-                    # Log the metrics that we do have
-                    if wandb_metrics:
-                        wandb.log(wandb_metrics)
+                    if not mrr_found:
+                        logger.warning("MRR metric not found")
                 
-                print(f"Completed training and evaluation for combination {i+1}/{len(hyperparameter_grid)}")
+                # Print all available metrics for debugging
+                logger.debug("All available metrics from complex_extended_bidirectional:")
+                for key, value in direct_metrics.items():
+                    if isinstance(value, dict):
+                        logger.debug(f"  {key}: <dict with {len(value)} items>")
+                    else:
+                        value_status = "NaN" if _is_missing(value) else str(value)
+                        logger.debug(f"  {key}: {value_status}")
+            else:
+                logger.warning("No metrics available from complex_extended_bidirectional results")
+                logger.warning("This could indicate that the evaluation did not complete successfully.")
+                logger.warning("Check the training log for errors or exceptions during evaluation.")
+            
+            # Still extract triples information from metrics.txt
+            metrics_file = os.path.join(combo_dir, 'metrics.txt')
+            if os.path.exists(metrics_file):
+                try:
+                    with open(metrics_file, 'r') as f:
+                        metrics_text = f.read()
+                        
+                        # Extract triples information
+                        original_triples_match = re.search(r"Original training triples: ([\d,]+)", metrics_text)
+                        if original_triples_match:
+                            original_triples = int(original_triples_match.group(1).replace(',', ''))
+                            triples_info["original_triples"] = original_triples
+                        
+                        new_triples_match = re.search(r"New triples added: ([\d,]+)", metrics_text)
+                        if new_triples_match:
+                            new_triples = int(new_triples_match.group(1).replace(',', ''))
+                            triples_info["new_triples"] = new_triples
+                        
+                        total_triples_match = re.search(r"Total triples: ([\d,]+)", metrics_text)
+                        if total_triples_match:
+                            total_triples = int(total_triples_match.group(1).replace(',', ''))
+                            triples_info["total_triples"] = total_triples
+                        
+                        # Check for entity information
+                        original_entities_match = re.search(r"Original entities: ([\d,]+)", metrics_text)
+                        if original_entities_match:
+                            original_entities = int(original_entities_match.group(1).replace(',', ''))
+                            triples_info["original_entities"] = original_entities
+                        
+                        new_entities_match = re.search(r"New entities: ([\d,]+)", metrics_text)
+                        if new_entities_match:
+                            new_entities = int(new_entities_match.group(1).replace(',', ''))
+                            triples_info["new_entities"] = new_entities
+                        
+                        total_entities_match = re.search(r"Total entities: ([\d,]+)", metrics_text)
+                        if total_entities_match:
+                            total_entities = int(total_entities_match.group(1).replace(',', ''))
+                            triples_info["total_entities"] = total_entities
+                        
+                        logger.info("Extracted triples information:")
+                        for key, value in triples_info.items():
+                            logger.info(f"{key}: {value:,}")
                 
-            finally:
-                # Restore original get_config function
-                train_extended_model.get_config = original_get_config
+                except Exception as e:
+                    logger.error(f"Error processing metrics file {metrics_file}: {str(e)}")
+            else:
+                logger.warning(f"Metrics file not found at {metrics_file}")
+            
+            # Store the results
+            original_triples = triples_info.get("original_triples")
+            trial = TrialResult(
+                probability_threshold=prob_threshold,
+                max_recommendations=max_recs,
+                sampling_rate=samp_rate,
+                hits_at_1=metrics.get("hits@1"),
+                hits_at_3=metrics.get("hits@3"),
+                hits_at_5=metrics.get("hits@5"),
+                hits_at_10=metrics.get("hits@10"),
+                mean_rank=metrics.get("mean_rank"),
+                mrr=metrics.get("mrr"),
+                original_triples=original_triples,
+                new_triples=triples_info.get("new_triples"),
+                total_triples=triples_info.get("total_triples"),
+                triples_increase_percent=(triples_info.get("new_triples", 0) / original_triples * 100) if original_triples else None,
+                original_entities=triples_info.get("original_entities"),
+                new_entities=triples_info.get("new_entities"),
+                total_entities=triples_info.get("total_entities"),
+                output_dir=combo_dir
+            )
+            result_record = trial.as_record()
+            with open(results_path, 'a') as f:
+                f.write(json.dumps(result_record, default=_json_default) + "\n")
+                f.flush()
+            
+            # Log result to wandb
+            if wandb_initialized:
+                # Drop None/NaN metrics once and reuse them for both key variants
+                base_metrics = {key: metrics.get(key) for key in METRIC_KEYS}
+                clean_metrics = {k: v for k, v in base_metrics.items() if not _is_missing(v)}
+                if 'mrr' in clean_metrics:
+                    clean_metrics['mean_reciprocal_rank'] = clean_metrics['mrr']
                 
+                missing = [k for k, v in base_metrics.items() if _is_missing(v)]
+                if missing:
+                    logger.warning(f"Not logging {', '.join(missing)} to wandb because they are None or NaN")
+                
+                wandb_metrics = {
+                    'probability_threshold': prob_threshold,
+                    'max_recommendations': max_recs,
+                    'sampling_rate': samp_rate,
+                    'combo_name': combo_name,
+                    **clean_metrics,
+                    **{f"combined_{k}": v for k, v in clean_metrics.items()},
+                }
+                wandb.log(wandb_metrics)
+            
+            print(f"Completed training and evaluation for combination {i+1}/{len(hyperparameter_grid)}")
+            
         except Exception as e:
             print(f"Error training model with hyperparameters: {e}")
     
-    # Convert results to DataFrame for easier analysis
-    if results:
-        df = pd.DataFrame(results)
+    # Rebuild the DataFrame from the trials log for easier analysis
+    df = pd.read_json(results_path, lines=True) if os.path.exists(results_path) else None
+    if df is not None and not df.empty:
         
         # Save results as CSV
         results_file = os.path.join(output_dir, 'hyperparameter_search_results.csv')
@@ -514,7 +601,7 @@ def run_hyperparameter_search(
         create_visualizations(df, plots_dir)
         
         # Log summary to wandb
-        if use_wandb and WANDB_AVAILABLE and df is not None:
+        if wandb is not None:
             # Finish any previous runs
             if wandb_initialized:
                 wandb.finish()
@@ -538,35 +625,15 @@ def run_hyperparameter_search(
                 }
             )
                 
-            # Define a helper function to safely get the best combo for a metric
-            def get_best_combo_safe(df, column, find_max=True):
-                try:
-                    # Filter out NaN values
-                    df_valid = df.dropna(subset=[column])
-                    if df_valid.empty:
-                        return None
-                            
-                    # Get the index of the best value
-                    idx = df_valid[column].idxmax() if find_max else df_valid[column].idxmin()
-                    return df_valid.loc[idx]
-                except Exception as e:
-                    print(f"Error getting best combo for {column}: {str(e)}")
-                    return None
-            
-            # Find the best combinations safely
-            best_hits1_combo = get_best_combo_safe(df, 'hits@1')
-            best_hits3_combo = get_best_combo_safe(df, 'hits@3')
-            best_hits5_combo = get_best_combo_safe(df, 'hits@5')
-            best_hits_combo = get_best_combo_safe(df, 'hits@10')
-            best_rank_combo = get_best_combo_safe(df, 'mean_rank', False)
-            best_mrr_combo = get_best_combo_safe(df, 'mrr')
+            # Find the best combinations in a single pass
+            best = get_best_combos(df)
             
             # Create a summary metrics dict
             summary_metrics = {}
             
             # Helper to safely add metrics
             def safe_add_metric(metrics_dict, name, combo, value_key):
-                if combo is not None and value_key in combo and not pd.isna(combo[value_key]):
+                if combo is not None and value_key in combo and not _is_missing(combo[value_key]):
                     # Add the best_ prefixed metrics
                     metrics_dict[f'best_{name}'] = combo[value_key]
                     metrics_dict[f'best_{name}_threshold'] = combo['probability_threshold']
@@ -576,36 +643,28 @@ def run_hyperparameter_search(
                     # Also add the regular metric name for compatibility with previous runs
                     metrics_dict[name] = combo[value_key]
             
-            # Add all metrics safely
-            safe_add_metric(summary_metrics, 'combined_hits@1', best_hits1_combo, 'hits@1')
-            safe_add_metric(summary_metrics, 'combined_hits@3', best_hits3_combo, 'hits@3')
-            safe_add_metric(summary_metrics, 'combined_hits@5', best_hits5_combo, 'hits@5')
-            safe_add_metric(summary_metrics, 'combined_hits@10', best_hits_combo, 'hits@10')
-            safe_add_metric(summary_metrics, 'combined_mean_rank', best_rank_combo, 'mean_rank')
-            safe_add_metric(summary_metrics, 'combined_mrr', best_mrr_combo, 'mrr')
-            safe_add_metric(summary_metrics, 'combined_mean_reciprocal_rank', best_mrr_combo, 'mrr')
+            # Add all metrics safely, under both the bare and combined_ names
+            combined_aliases = {'mrr': ['mean_reciprocal_rank']}
+            for key in METRIC_KEYS:
+                combo = best[key]
+                safe_add_metric(summary_metrics, key, combo, key)
+                safe_add_metric(summary_metrics, f'combined_{key}', combo, key)
+                for alias in combined_aliases.get(key, []):
+                    safe_add_metric(summary_metrics, f'combined_{alias}', combo, key)
             
-            safe_add_metric(summary_metrics, 'hits@1', best_hits1_combo, 'hits@1')
-            safe_add_metric(summary_metrics, 'hits@3', best_hits3_combo, 'hits@3')
-            safe_add_metric(summary_metrics, 'hits@5', best_hits5_combo, 'hits@5')
-            safe_add_metric(summary_metrics, 'hits@10', best_hits_combo, 'hits@10')
-            safe_add_metric(summary_metrics, 'mean_rank', best_rank_combo, 'mean_rank')
-            safe_add_metric(summary_metrics, 'mrr', best_mrr_combo, 'mrr')
-            
-            # Log the summary metrics
-            if summary_metrics:
-                wandb.log(summary_metrics)
-            else:
+            if not summary_metrics:
                 print("Warning: No valid metrics to log to wandb summary")
             
-            # Log summary table
+            # Summary table and plots
             summary_table = wandb.Table(dataframe=df)
-            wandb.log({"results_table": summary_table})
+            with os.scandir(plots_dir) as entries:
+                images = {
+                    entry.name[:-len('.png')]: wandb.Image(entry.path)
+                    for entry in entries if entry.name.endswith('.png')
+                }
             
-            # Log plots
-            for plot_file in os.listdir(plots_dir):
-                if plot_file.endswith('.png'):
-                    wandb.log({plot_file.replace('.png', ''): wandb.Image(os.path.join(plots_dir, plot_file))})
+            # Log everything in a single call
+            wandb.log({**summary_metrics, "results_table": summary_table, **images})
             
             # Finish wandb run
             wandb.finish()
@@ -617,93 +676,100 @@ def run_hyperparameter_search(
             wandb.finish()
         return None
 
+def get_best_combos(df):
+    """
+    Find the best hyperparameter combination for every metric.
+    
+    Args:
+        df: DataFrame with one row per hyperparameter combination
+    
+    Returns:
+        Dict mapping each metric in METRIC_KEYS to its best row, or None if the
+        metric has no valid values
+    """
+    import pandas as pd
+    
+    valid = [c for c in METRIC_KEYS if c in df.columns and df[c].notna().any()]
+    max_cols = [c for c in valid if c not in LOWER_IS_BETTER]
+    min_cols = [c for c in valid if c in LOWER_IS_BETTER]
+    
+    # One idxmax/idxmin pass over all metric columns, skipping NaN values
+    best_idx = pd.concat([df[max_cols].idxmax(), df[min_cols].idxmin()])
+    return {c: (df.loc[best_idx[c]] if c in best_idx.index else None) for c in METRIC_KEYS}
+
 def create_visualizations(df, plots_dir):
     """Create visualizations of hyperparameter search results."""
+    # Nothing to plot if the search produced no valid metrics
+    plotted = [c for c in ('hits@1', 'hits@10', 'mrr') if c in df.columns]
+    if df.empty or not plotted or df[plotted].isna().all().all():
+        print("No valid metric data; skipping visualizations")
+        return
+    
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+    
+    # Unique grid values, computed once
+    sampling_rates = df['sampling_rate'].unique()
+    
+    plt.rcParams.update({
+        'path.simplify': True,
+        'path.simplify_threshold': 1.0,
+        'agg.path.chunksize': 10000,
+        'figure.max_open_warning': 0,
+    })
+    
+    # One figure per heatmap metric, reused for every sampling rate
+    heatmap_figures = {
+        metric: plt.subplots(1, 2, figsize=(10, 8), gridspec_kw={'width_ratios': [20, 1]})
+        for metric, *_ in HEATMAPS
+    }
+    
     # Create heatmaps for each sampling rate
-    for sampling_rate in df['sampling_rate'].unique():
+    if len(sampling_rates) == 0:
+        print("Warning: No sampling rates in results, skipping heatmaps")
+    for sampling_rate in sampling_rates:
         # Filter data for this sampling rate
         df_filtered = df[df['sampling_rate'] == sampling_rate]
         
-        # Pivot the data to create a heatmap
-        pivot_hits = df_filtered.pivot_table(
-            index='probability_threshold', 
-            columns='max_recommendations',
-            values='hits@10'
-        )
-        
-        pivot_rank = df_filtered.pivot_table(
-            index='probability_threshold', 
+        # Pivot all heatmap metrics in a single grouping pass
+        pivots = df_filtered.pivot_table(
+            index='probability_threshold',
             columns='max_recommendations',
-            values='mean_rank'
+            values=[metric for metric, *_ in HEATMAPS]
         )
         
-        pivot_mrr = df_filtered.pivot_table(
-            index='probability_threshold', 
-            columns='max_recommendations',
-            values='mrr'
-        )
-        
-        # Plot hits@10 heatmap
-        plt.figure(figsize=(10, 8))
-        plt.title(f'Hits@10 for Sampling Rate = {sampling_rate}')
-        plt.imshow(pivot_hits, cmap='viridis')
-        plt.colorbar(label='Hits@10')
-        plt.xlabel('Max Recommendations')
-        plt.ylabel('Probability Threshold')
-        plt.xticks(range(len(pivot_hits.columns)), pivot_hits.columns)
-        plt.yticks(range(len(pivot_hits.index)), pivot_hits.index)
-        for i in range(len(pivot_hits.index)):
-            for j in range(len(pivot_hits.columns)):
-                plt.text(j, i, f"{pivot_hits.iloc[i, j]:.4f}", ha="center", va="center", color="w")
-        plt.tight_layout()
-        plt.savefig(os.path.join(plots_dir, f'hits_heatmap_samp{sampling_rate}.png'))
-        plt.close()
-        
-        # Plot mean rank heatmap (lower is better)
-        plt.figure(figsize=(10, 8))
-        plt.title(f'Mean Rank for Sampling Rate = {sampling_rate}')
-        plt.imshow(pivot_rank, cmap='viridis_r')  # reversed colormap as lower is better
-        plt.colorbar(label='Mean Rank')
-        plt.xlabel('Max Recommendations')
-        plt.ylabel('Probability Threshold')
-        plt.xticks(range(len(pivot_rank.columns)), pivot_rank.columns)
-        plt.yticks(range(len(pivot_rank.index)), pivot_rank.index)
-        for i in range(len(pivot_rank.index)):
-            for j in range(len(pivot_rank.columns)):
-                plt.text(j, i, f"{pivot_rank.iloc[i, j]:.1f}", ha="center", va="center", color="w")
-        plt.tight_layout()
-        plt.savefig(os.path.join(plots_dir, f'rank_heatmap_samp{sampling_rate}.png'))
-        plt.close()
-        
-        # Plot MRR heatmap
-        plt.figure(figsize=(10, 8))
-        plt.title(f'MRR for Sampling Rate = {sampling_rate}')
-        plt.imshow(pivot_mrr, cmap='viridis')
-        plt.colorbar(label='MRR')
-        plt.xlabel('Max Recommendations')
-        plt.ylabel('Probability Threshold')
-        plt.xticks(range(len(pivot_mrr.columns)), pivot_mrr.columns)
-        plt.yticks(range(len(pivot_mrr.index)), pivot_mrr.index)
-        for i in range(len(pivot_mrr.index)):
-            for j in range(len(pivot_mrr.columns)):
-                plt.text(j, i, f"{pivot_mrr.iloc[i, j]:.6f}", ha="center", va="center", color="w")
-        plt.tight_layout()
-        plt.savefig(os.path.join(plots_dir, f'mrr_heatmap_samp{sampling_rate}.png'))
-        plt.close()
+        for metric, label, fmt, cmap, prefix in HEATMAPS:
+            # Metrics without any valid values are dropped by pivot_table
+            if metric not in pivots.columns.get_level_values(0):
+                print(f"Warning: No {label} values for sampling rate {sampling_rate}, skipping heatmap")
+                continue
+            
+            fig, (ax, cax) = heatmap_figures[metric]
+            ax.clear()
+            cax.clear()
+            sns.heatmap(pivots[metric], annot=True, fmt=fmt, cmap=cmap, ax=ax, cbar_ax=cax, cbar_kws={'label': label})
+            ax.set_title(f'{label} for Sampling Rate = {sampling_rate}')
+            ax.set_xlabel('Max Recommendations')
+            ax.set_ylabel('Probability Threshold')
+            fig.tight_layout()
+            fig.savefig(os.path.join(plots_dir, f'{prefix}_heatmap_samp{sampling_rate}.png'))
+    
+    for fig, _ in heatmap_figures.values():
+        plt.close(fig)
     
     # Create line plots for each metric
     # Hits@10 vs probability_threshold for different max_recommendations
     plt.figure(figsize=(10, 6))
-    for max_rec in df['max_recommendations'].unique():
-        for samp_rate in df['sampling_rate'].unique():
-            df_filtered = df[(df['max_recommendations'] == max_rec) & (df['sampling_rate'] == samp_rate)]
-            if not df_filtered.empty:
-                plt.plot(
-                    df_filtered['probability_threshold'], 
-                    df_filtered['hits@10'],
-                    marker='o',
-                    label=f'Max Rec={max_rec}, Samp={samp_rate}'
-                )
+    for (max_rec, samp_rate), df_filtered in df.groupby(['max_recommendations', 'sampling_rate'], sort=False):
+        plt.plot(
+            df_filtered['probability_threshold'], 
+            df_filtered['hits@10'],
+            marker='o',
+            label=f'Max Rec={max_rec}, Samp={samp_rate}'
+        )
     plt.xlabel('Probability Threshold')
     plt.ylabel('Hits@10')
     plt.title('Hits@10 vs Probability Threshold')
@@ -712,29 +778,17 @@ def create_visualizations(df, plots_dir):
     plt.savefig(os.path.join(plots_dir, 'hits_vs_threshold.png'))
     plt.close()
     
-    # Find the best hyperparameter combinations with null safety checks
-    # Helper function to safely get best combo
-    def safely_get_best_combo(df, column, find_max=True):
-        if df[column].isna().all():
-            # Return first row if all values are NaN
-            return df.iloc[0] if not df.empty else None
-        else:
-            # Drop NaN values and find max/min
-            df_valid = df.dropna(subset=[column])
-            if df_valid.empty:
-                return df.iloc[0] if not df.empty else None
-            else:
-                if find_max:
-                    return df_valid.loc[df_valid[column].idxmax()]
-                else:
-                    return df_valid.loc[df_valid[column].idxmin()]
-    
-    best_hits1_combo = safely_get_best_combo(df, 'hits@1', True)
-    best_hits3_combo = safely_get_best_combo(df, 'hits@3', True)
-    best_hits5_combo = safely_get_best_combo(df, 'hits@5', True)
-    best_hits_combo = safely_get_best_combo(df, 'hits@10', True)
-    best_rank_combo = safely_get_best_combo(df, 'mean_rank', False)  # lower is better
-    best_mrr_combo = safely_get_best_combo(df, 'mrr', True)
+    # Find the best hyperparameter combinations, falling back to the first
+    # row for metrics without any valid values
+    best = get_best_combos(df)
+    if not df.empty:
+        best = {k: (v if v is not None else df.iloc[0]) for k, v in best.items()}
+    best_hits1_combo = best['hits@1']
+    best_hits3_combo = best['hits@3']
+    best_hits5_combo = best['hits@5']
+    best_hits_combo = best['hits@10']
+    best_rank_combo = best['mean_rank']  # lower is better
+    best_mrr_combo = best['mrr']
     
     # Skip visualization if we don't have valid results
     if best_hits1_combo is None or best_hits_combo is None:
@@ -752,38 +806,35 @@ def create_visualizations(df, plots_dir):
         'Best MRR': best_mrr_combo
     }
     
-    # Prepare data for summary plot
-    combo_params = pd.DataFrame({
-        'Combo': list(best_combos.keys()),
-        'Probability Threshold': [combo['probability_threshold'] for combo in best_combos.values()],
-        'Max Recommendations': [combo['max_recommendations'] for combo in best_combos.values()],
-        'Sampling Rate': [combo['sampling_rate'] for combo in best_combos.values()]
-    })
+    # Prepare data for summary plot: one row per best combination
+    combo_params = pd.DataFrame(
+        {name: combo for name, combo in best_combos.items() if combo is not None}
+    ).T[['probability_threshold', 'max_recommendations', 'sampling_rate']].astype(float)
     
     # Plot the best combinations
     fig, axs = plt.subplots(3, 1, figsize=(12, 15))
     
     # Plot probability thresholds
-    axs[0].bar(combo_params['Combo'], combo_params['Probability Threshold'])
+    axs[0].bar(combo_params.index, combo_params['probability_threshold'])
     axs[0].set_title('Best Probability Thresholds')
     axs[0].set_ylabel('Probability Threshold')
     axs[0].grid(axis='y')
     
     # Plot max recommendations
-    axs[1].bar(combo_params['Combo'], combo_params['Max Recommendations'])
+    axs[1].bar(combo_params.index, combo_params['max_recommendations'])
     axs[1].set_title('Best Max Recommendations')
     axs[1].set_ylabel('Max Recommendations')
     axs[1].grid(axis='y')
     
     # Plot sampling rates
-    axs[2].bar(combo_params['Combo'], combo_params['Sampling Rate'])
+    axs[2].bar(combo_params.index, combo_params['sampling_rate'])
     axs[2].set_title('Best Sampling Rates')
     axs[2].set_ylabel('Sampling Rate')
     axs[2].grid(axis='y')
     
-    plt.tight_layout()
-    plt.savefig(os.path.join(plots_dir, 'best_combinations.png'))
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(os.path.join(plots_dir, 'best_combinations.png'))
+    plt.close(fig)
     
     # Save the best combinations as text
     with open(os.path.join(plots_dir, 'best_combinations.txt'), 'w') as f:
@@ -855,9 +906,16 @@ def main():
                         help="Log results to Weights & Biases")
     parser.add_argument("--max-combinations", type=int,
                         help="Maximum number of combinations to try (default: all)")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="Only log warnings and errors for each combination")
     
     args = parser.parse_args()
     
+    if args.quiet:
+        logger.setLevel(logging.WARNING)
+    
+    import pandas as pd
+    
     result_df = run_hyperparameter_search(
         baseline_dir=args.baseline_dir,
         output_dir=args.output_dir,
@@ -876,36 +934,18 @@ def main():
         print("\n=== Hyperparameter Search Complete ===")
         print("\nBest combinations for each metric:")
         
-        # Helper function to safely print best combos
-        def safely_print_best_combo(df, column, desc, format_str, find_max=True):
-            if df[column].isna().all():
+        best = get_best_combos(result_df)
+        for column, desc, format_str in BEST_COMBO_REPORTS:
+            best_combo = best[column]
+            if best_combo is None:
                 print(f"\n{desc}: (No valid data)")
-                return
-                
-            df_valid = df.dropna(subset=[column])
-            if df_valid.empty:
-                print(f"\n{desc}: (No valid data)")
-                return
-                
-            if find_max:
-                best_combo = df_valid.loc[df_valid[column].idxmax()]
-                value = best_combo[column]
-            else:
-                best_combo = df_valid.loc[df_valid[column].idxmin()]
-                value = best_combo[column]
-                
-            print(f"\n{desc} ({value:{format_str}}):")
+                continue
+            
+            print(f"\n{desc} ({best_combo[column]:{format_str}}):")
             print(f"  Probability Threshold: {best_combo['probability_threshold']}")
             print(f"  Max Recommendations: {best_combo['max_recommendations']}")
             print(f"  Sampling Rate: {best_combo['sampling_rate']}")
         
-        safely_print_best_combo(result_df, 'hits@1', "Best for Hits@1", ".4f")
-        safely_print_best_combo(result_df, 'hits@3', "Best for Hits@3", ".4f")
-        safely_print_best_combo(result_df, 'hits@5', "Best for Hits@5", ".4f")
-        safely_print_best_combo(result_df, 'hits@10', "Best for Hits@10", ".4f")
-        safely_print_best_combo(result_df, 'mean_rank', "Best for Mean Rank", ".1f", False)
-        safely_print_best_combo(result_df, 'mrr', "Best for MRR", ".6f")
-        
         # Create a more detailed summary table
         print("\nCreating detailed summary table...")
         
@@ -917,11 +957,9 @@ def main():
             'hits@1', 'hits@3', 'hits@5', 'hits@10', 'mean_rank', 'mrr'
         ]
         
-        # Get just the columns we want in a specific order
-        summary_df = result_df[summary_columns].copy()
-        
-        # Sort by hits@10 in descending order
-        summary_df = summary_df.sort_values('hits@10', ascending=False)
+        # Get just the columns we want in a specific order, sorted by hits@10
+        # in descending order (sort_values already returns a new frame)
+        summary_df = result_df[summary_columns].sort_values('hits@10', ascending=False, na_position='last')
         
         # Format percentage columns
         if 'triples_increase_percent' in summary_df.columns:
@@ -929,12 +967,13 @@ def main():
         
         # Save as CSV
         summary_file = os.path.join(args.output_dir, 'hyperparameter_search_summary.csv')
-        summary_df.to_csv(summary_file, index=False)
+        summary_df.to_csv(summary_file, index=False, float_format='%.6f', chunksize=10000)
         print(f"Saved detailed summary to {summary_file}")
         
         # Also save as human-readable text file
         text_summary_file = os.path.join(args.output_dir, 'hyperparameter_search_summary.txt')
-        with open(text_summary_file, 'w') as f:
+        # Build the report in memory and write it to disk in one go
+        with io.StringIO() as f:
             f.write("=== Hyperparameter Search Summary ===\n\n")
             
             # Write the date and time
@@ -943,99 +982,39 @@ def main():
             # Write the best combinations
             f.write("=== Best Combinations ===\n\n")
             
-            # Helper function to safely extract best combos for a metric
-            def get_safe_combo_for_metric(df, column, find_max=True):
-                if df[column].isna().all():
-                    return None
-                    
-                df_valid = df.dropna(subset=[column])
-                if df_valid.empty:
-                    return None
-                    
-                if find_max:
-                    return df_valid.loc[df_valid[column].idxmax()]
-                else:
-                    return df_valid.loc[df_valid[column].idxmin()]
-            
-            # Get the best combos safely
-            safe_best_hits1 = get_safe_combo_for_metric(result_df, 'hits@1', True)
-            safe_best_hits10 = get_safe_combo_for_metric(result_df, 'hits@10', True)
-            safe_best_rank = get_safe_combo_for_metric(result_df, 'mean_rank', False)
-            safe_best_mrr = get_safe_combo_for_metric(result_df, 'mrr', True)
-            
-            # Write best for Hits@1
-            if safe_best_hits1 is None:
-                f.write("Best for Hits@1: No valid data available\n\n")
-            else:
-                f.write(f"Best for Hits@1 ({safe_best_hits1['hits@1']:.4f}):\n")
-                f.write(f"  Probability Threshold: {safe_best_hits1['probability_threshold']}\n")
-                f.write(f"  Max Recommendations: {safe_best_hits1['max_recommendations']}\n")
-                f.write(f"  Sampling Rate: {safe_best_hits1['sampling_rate']}\n")
-                f.write(f"  New Triples: {format_value(safe_best_hits1.get('new_triples'))}\n")
-                f.write(f"  Triples Increase: {format_value(safe_best_hits1.get('triples_increase_percent'))}\n\n")
-            
-            # Write best for Hits@10
-            if safe_best_hits10 is None:
-                f.write("Best for Hits@10: No valid data available\n\n")
-            else:
-                f.write(f"Best for Hits@10 ({safe_best_hits10['hits@10']:.4f}):\n")
-                f.write(f"  Probability Threshold: {safe_best_hits10['probability_threshold']}\n")
-                f.write(f"  Max Recommendations: {safe_best_hits10['max_recommendations']}\n")
-                f.write(f"  Sampling Rate: {safe_best_hits10['sampling_rate']}\n")
-                f.write(f"  New Triples: {format_value(safe_best_hits10.get('new_triples'))}\n")
-                f.write(f"  Triples Increase: {format_value(safe_best_hits10.get('triples_increase_percent'))}\n\n")
-            
-            # Write best for Mean Rank
-            if safe_best_rank is None:
-                f.write("Best for Mean Rank: No valid data available\n\n")
-            else:
-                f.write(f"Best for Mean Rank ({safe_best_rank['mean_rank']:.1f}):\n")
-                f.write(f"  Probability Threshold: {safe_best_rank['probability_threshold']}\n")
-                f.write(f"  Max Recommendations: {safe_best_rank['max_recommendations']}\n")
-                f.write(f"  Sampling Rate: {safe_best_rank['sampling_rate']}\n")
-                f.write(f"  New Triples: {format_value(safe_best_rank.get('new_triples'))}\n")
-                f.write(f"  Triples Increase: {format_value(safe_best_rank.get('triples_increase_percent'))}\n\n")
-            
-            # Write best for MRR
-            if safe_best_mrr is None:
-                f.write("Best for MRR: No valid data available\n\n")
-            else:
-                f.write(f"Best for MRR ({safe_best_mrr['mrr']:.6f}):\n")
-                f.write(f"  Probability Threshold: {safe_best_mrr['probability_threshold']}\n")
-                f.write(f"  Max Recommendations: {safe_best_mrr['max_recommendations']}\n")
-                f.write(f"  Sampling Rate: {safe_best_mrr['sampling_rate']}\n")
-                f.write(f"  New Triples: {format_value(safe_best_mrr.get('new_triples'))}\n")
-                f.write(f"  Triples Increase: {format_value(safe_best_mrr.get('triples_increase_percent'))}\n\n")
+            # Reuse the best combinations found above instead of rescanning
+            report_metrics = ('hits@1', 'hits@10', 'mean_rank', 'mrr')
+            for column, desc, format_str in BEST_COMBO_REPORTS:
+                if column not in report_metrics:
+                    continue
+                best_combo = best[column]
+                if best_combo is None:
+                    f.write(f"{desc}: No valid data available\n\n")
+                    continue
+                
+                f.write(f"{desc} ({best_combo[column]:{format_str}}):\n")
+                f.write(f"  Probability Threshold: {best_combo['probability_threshold']}\n")
+                f.write(f"  Max Recommendations: {best_combo['max_recommendations']}\n")
+                f.write(f"  Sampling Rate: {best_combo['sampling_rate']}\n")
+                f.write(f"  New Triples: {format_value(best_combo.get('new_triples'))}\n")
+                f.write(f"  Triples Increase: {format_value(best_combo.get('triples_increase_percent'))}\n\n")
             
             # Write a table of all results
             f.write("=== All Results (sorted by Hits@10) ===\n\n")
-            f.write("Prob | MaxRec | Samp | New Triples | Triples % | Hits@1 | Hits@3 | Hits@5 | Hits@10 | MeanRank | MRR\n")
-            f.write("-" * 120 + "\n")
             
-            for _, row in summary_df.iterrows():
-                f.write(f"{row['probability_threshold']:.1f} | ")
-                f.write(f"{row['max_recommendations']:6d} | ")
-                f.write(f"{row['sampling_rate']:.1f} | ")
-                # Use the format_value function to safely handle None values
-                new_triples = format_value(row.get('new_triples'))
-                f.write(f"{new_triples:11} | ")
-                triples_pct = row.get('triples_increase_percent', 'N/A')
-                f.write(f"{triples_pct:9} | ")
-                
-                # Handle numeric metrics similarly
-                hits1 = format_value(row.get('hits@1'))
-                hits3 = format_value(row.get('hits@3'))
-                hits5 = format_value(row.get('hits@5'))
-                hits10 = format_value(row.get('hits@10'))
-                mean_rank = format_value(row.get('mean_rank'))
-                mrr = format_value(row.get('mrr'))
-                
-                f.write(f"{hits1:6} | ")
-                f.write(f"{hits3:6} | ")
-                f.write(f"{hits5:6} | ")
-                f.write(f"{hits10:7} | ")
-                f.write(f"{mean_rank:8} | ")
-                f.write(f"{mrr:6}\n")
+            # Format each column in one vectorized pass
+            table_df = summary_df[list(TABLE_HEADERS)].assign(**{
+                column: summary_df[column].map(lambda v, fmt=fmt: fmt.format(v) if pd.notna(v) else 'N/A')
+                for column, fmt in TABLE_FORMATS.items()
+            })
+            table = table_df.to_string(index=False, header=list(TABLE_HEADERS.values()))
+            header, _, rows = table.partition("\n")
+            f.write(header + "\n")
+            f.write("-" * len(header) + "\n")
+            f.write(rows + "\n")
+            
+            with open(text_summary_file, 'w', buffering=1 << 20) as out:
+                out.write(f.getvalue())
             
         print(f"Saved text summary to {text_summary_file}")
     
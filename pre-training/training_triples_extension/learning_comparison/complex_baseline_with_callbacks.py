@@ -7,12 +7,17 @@ Based on complex_baseline.py but uses PyKEEN callbacks for metric tracking.
 import os
 import os.path as osp
 import logging
+import functools
+import csv
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import torch
 import numpy as np
-import pandas as pd
 from pykeen.pipeline import pipeline
 from pykeen.triples import TriplesFactory
 from pykeen.training.callbacks import TrainingCallback
+from pykeen.evaluation import RankBasedEvaluator, SampledRankBasedEvaluator
 import argparse
 import time
 import json
@@ -21,6 +26,9 @@ import json
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Let cuDNN pick the fastest kernels for the fixed batch shapes
+torch.backends.cudnn.benchmark = True
+
 def get_config(key, default=None):
     """Get configuration from environment or use default."""
     configs = {
@@ -29,106 +37,404 @@ def get_config(key, default=None):
         'model.embedding_dim': 1000,  
         'model.max_epochs': 100,     
         'model.batch_size_train': 1000,  
-        'model.batch_size_eval': 256,  
+        'model.num_workers': 0,  # Batches built in the main process; raise to use DataLoader worker processes
+        'model.batch_size_eval': None,  # None = let PyKEEN find the largest batch that fits in memory (synchronous eval only)
         'model.learning_rate': 0.1,  
-        'sampling.negative_o': 1000,  
         'model.dropout': 0.5,  
         'model.regularize_weight': 0.05,  
         'model.relation_dropout': 0.22684140529516872,  
         'model.relation_regularize_weight': 8.266519211068944e-14,  
+        'model.autocast_dtype': None,  # FP32 by default; 'bfloat16' opts into mixed-precision training on CUDA
+        'model.tf32': False,  # Set True to allow TF32 tensor-core matmuls on CUDA (Ampere+)
+        'model.compile': False,  # Set True to fuse the ComplEx interaction with torch.compile (PyTorch 2.x, adds warm-up time)
+        'model.async_eval': False,  # Evaluate each epoch on a side CUDA stream while training continues
+        'model.batch_size_eval_async': 256,  # Fixed eval batch size used with async_eval
     }
     return configs.get(key, default)
 
+def _autocast_score(score_fn, dtype, *args, **kwargs):
+    """Call a scoring function under CUDA autocast and return FP32 scores.
+    
+    Autocast only applies while gradients are enabled, i.e. during training; evaluation
+    runs under inference mode and keeps full FP32 scores, where reduced precision would
+    produce ties in the rankings.
+    """
+    if not torch.is_grad_enabled():
+        return score_fn(*args, **kwargs)
+    with torch.autocast('cuda', dtype=dtype):
+        scores = score_fn(*args, **kwargs)
+    return scores.float()
+
+class AutocastCallback(TrainingCallback):
+    """Callback that runs the model's scoring functions in mixed precision during training.
+    
+    The embeddings stay in FP32 and only the training forward pass is autocast;
+    evaluation (MetricLoggerCallback, early stopping, final test) is scored in FP32.
+    The original scoring functions are restored after training.
+    """
+    
+    def __init__(self, dtype=torch.bfloat16):
+        super().__init__()
+        self.dtype = dtype
+        self._patched = []
+    
+    def register_training_loop(self, training_loop):
+        """Wrap the scoring functions once the training loop (and model) is known."""
+        super().register_training_loop(training_loop)
+        model = training_loop.model
+        for name in ('score_hrt', 'score_h', 'score_t'):
+            # functools.partial (not a closure) keeps the model picklable
+            setattr(model, name, functools.partial(_autocast_score, getattr(model, name), self.dtype))
+            self._patched.append(name)
+    
+    def post_train(self, losses, **kwargs):
+        """Restore the original scoring functions by removing the instance-level wrappers."""
+        for name in self._patched:
+            delattr(self.model, name)
+        self._patched = []
+
+class CompileCallback(TrainingCallback):
+    """Callback that compiles the model's interaction function with torch.compile.
+    
+    The ComplEx interaction is a chain of elementwise products and a sum, which
+    torch.compile fuses into a single kernel. The original function is restored
+    after training so the saved model does not hold compiled code.
+    """
+    
+    def __init__(self, mode='default'):
+        super().__init__()
+        self.mode = mode
+        self._original_forward = None
+    
+    def register_training_loop(self, training_loop):
+        """Compile the interaction once the training loop (and model) is known."""
+        super().register_training_loop(training_loop)
+        interaction = training_loop.model.interaction
+        self._original_forward = interaction.forward
+        interaction.forward = torch.compile(interaction.forward, mode=self.mode, dynamic=True)
+    
+    def post_train(self, losses, **kwargs):
+        """Restore the uncompiled interaction."""
+        if self._original_forward is not None:
+            self.model.interaction.forward = self._original_forward
+
+class AsyncCheckpointCallback(TrainingCallback):
+    """Callback that saves the model weights every few epochs on a background thread.
+    
+    The weights are copied to the CPU synchronously, so the snapshot is consistent,
+    and only the disk write overlaps with the following epochs.
+    """
+    
+    def __init__(self, checkpoint_path, frequency=5):
+        super().__init__()
+        self.checkpoint_path = checkpoint_path
+        self.frequency = frequency
+        self._thread = None
+    
+    def _wait(self):
+        """Wait for the previous checkpoint write to finish."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def post_epoch(self, epoch: int, epoch_loss: float, **kwargs):
+        """Snapshot the weights and write them in the background every frequency epochs."""
+        if (epoch + 1) % self.frequency != 0:
+            return
+        snapshot = {
+            'epoch': epoch + 1,
+            'model_state_dict': {k: v.detach().cpu().clone() for k, v in self.model.state_dict().items()},
+        }
+        # Both writes go to the same file, so never let them overlap
+        self._wait()
+        self._thread = threading.Thread(target=torch.save, args=(snapshot, self.checkpoint_path))
+        self._thread.start()
+    
+    def post_train(self, losses, **kwargs):
+        """Make sure the last checkpoint is on disk before training returns."""
+        self._wait()
+
+# Metric columns; sampled evaluations are written under the same names with a 'sampled_' prefix
+# so they never mix with the full 1-vs-all results
+METRIC_NAMES = ['Hits@1', 'Hits@3', 'Hits@5', 'Hits@10', 'MRR', 'Mean_Rank']
+
+# Columns of the per-epoch metrics CSV
+METRIC_FIELDNAMES = (
+    ['epoch', 'loss', 'eval_time', 'eval_type']
+    + METRIC_NAMES
+    + [f'sampled_{name}' for name in METRIC_NAMES]
+    + ['error']
+)
+
 class MetricLoggerCallback(TrainingCallback):
     """Custom callback to log evaluation metrics after each epoch."""
     
-    def __init__(self, output_dir, validation_triples_factory, training_triples_factory, test_triples_factory, eval_batch_size=256):
+    def __init__(self, output_dir, validation_triples_factory, training_triples_factory, test_triples_factory, eval_batch_size=None,
+                 full_eval_every=10, num_negatives=100, json_every=10, async_eval=False, log_every=1):
         super().__init__()
         self.output_dir = output_dir
         self.validation_triples_factory = validation_triples_factory
         self.training_triples_factory = training_triples_factory
         self.test_triples_factory = test_triples_factory
         self.eval_batch_size = eval_batch_size
+        self.full_eval_every = full_eval_every
+        self.json_every = json_every
+        self.log_every = log_every
         self.logs = []
+        # Validation triples staged on the model device on the first epoch
+        self.validation_triples = None
+        
+        # Asynchronous evaluation: a copy of the model is evaluated on a side CUDA stream
+        # in a worker thread while the next epoch trains
+        self.async_eval = async_eval and torch.cuda.is_available()
+        if self.async_eval and eval_batch_size is None:
+            # The automatic batch-size search measures free memory, which training changes underneath it
+            raise ValueError("Asynchronous evaluation requires a fixed eval_batch_size")
+        self.eval_model = None
+        self.eval_stream = torch.cuda.Stream() if self.async_eval else None
+        self.executor = ThreadPoolExecutor(max_workers=1) if self.async_eval else None
+        self.pending = None
+        
+        # Filter triples do not change between epochs, so concatenate them once
+        self.filter_triples = torch.cat([
+            training_triples_factory.mapped_triples,
+            validation_triples_factory.mapped_triples,
+            test_triples_factory.mapped_triples
+        ], dim=0)
+        
+        # Full 1-vs-all evaluator, reused for every full evaluation
+        self.full_evaluator = RankBasedEvaluator(filtered=True, automatic_memory_optimization=True)
+        
+        # Sampled evaluator for the cheap per-epoch log: ranks each validation triple
+        # against num_negatives sampled entities instead of all entities
+        self.sampled_evaluator = SampledRankBasedEvaluator(
+            evaluation_factory=validation_triples_factory,
+            additional_filter_triples=[self.filter_triples],
+            num_negatives=num_negatives
+        )
         self.csv_path = osp.join(output_dir, 'baseline_epoch_metrics.csv')
         self.json_path = osp.join(output_dir, 'baseline_epoch_metrics.json')
         
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
         
-    def post_epoch(self, epoch: int, epoch_loss: float, **kwargs):
-        """Called after each training epoch."""
-        print(f"\nLogging metrics for epoch {epoch + 1}...")
+        # The CSV is opened on the first row and kept open to append one row per epoch
+        # instead of rewriting it; close() releases it, also when training fails
+        self.csv_file = None
+        self.csv_writer = None
+    
+    def register_training_loop(self, training_loop):
+        """Create the evaluation copy of the model for asynchronous evaluation."""
+        super().register_training_loop(training_loop)
+        if self.async_eval:
+            # Copied here, before later callbacks (autocast, compile) patch the model
+            self.eval_model = copy.deepcopy(training_loop.model)
+    
+    def _save_json(self):
+        """Write all logged epochs to the JSON file."""
+        with open(self.json_path, 'w') as f:
+            json.dump(self.logs, f, indent=2)
+    
+    def _log_epoch(self, metrics):
+        """Record one epoch: append it to the CSV and refresh the JSON every json_every epochs."""
+        self.logs.append(metrics)
+        if self.csv_file is None:
+            self.csv_file = open(self.csv_path, 'w', newline='')
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=METRIC_FIELDNAMES, restval='', extrasaction='ignore')
+            self.csv_writer.writeheader()
+        self.csv_writer.writerow(metrics)
+        self.csv_file.flush()
+        if len(self.logs) % self.json_every == 0:
+            self._save_json()
+    
+    def _log_error(self, epoch, epoch_loss, error):
+        """Record an epoch whose evaluation failed."""
+        print(f"Error during evaluation: {error}")
+        # Log error but continue training
+        error_metrics = {
+            'epoch': epoch + 1, 
+            'loss': float(epoch_loss), 
+            'error': str(error)
+        }
+        self._log_epoch(error_metrics)
+    
+    def _report(self, metrics):
+        """Record one epoch's metrics and print them."""
+        self._log_epoch(metrics)
         
-        try:
-            # Import evaluator here to avoid circular imports
-            from pykeen.evaluation import RankBasedEvaluator
-            
-            # Create evaluator if not available
-            evaluator = RankBasedEvaluator()
+        # Print a one-line summary every log_every epochs
+        if metrics['epoch'] % self.log_every == 0:
+            prefix = '' if metrics['eval_type'] == 'full' else 'sampled_'
+            print("Epoch {} | loss {:.4f} | MRR {:.4f} | H@1 {:.4f} | H@10 {:.4f} | {} eval {:.1f}s".format(
+                metrics['epoch'], metrics['loss'],
+                metrics.get(f'{prefix}MRR', float('nan')), metrics.get(f'{prefix}Hits@1', float('nan')),
+                metrics.get(f'{prefix}Hits@10', float('nan')), metrics['eval_type'], metrics['eval_time']))
+    
+    def _evaluate(self, model, epoch, epoch_loss, full_eval):
+        """
+        Evaluate a model on the validation set with proper filtering.
+        
+        Args:
+            model: Model to evaluate
+            epoch: Zero-based epoch index
+            epoch_loss: Training loss of the epoch
+            full_eval: Whether to rank against all entities instead of sampled negatives
             
-            # Evaluate model on validation set with proper filtering
+        Returns:
+            Dictionary with the metrics row for the epoch
+        """
+        # Full 1-vs-all ranking only every full_eval_every epochs, sampled ranking otherwise
+        evaluator = self.full_evaluator if full_eval else self.sampled_evaluator
+        
+        # Time on the GPU with CUDA events (recorded on the current stream); wall clock on CPU
+        use_cuda_timing = torch.cuda.is_available()
+        if use_cuda_timing:
+            start_event = torch.cuda.Event(enable_timing=True)
+            end_event = torch.cuda.Event(enable_timing=True)
+            start_event.record()
+        else:
             start_time = time.time()
+        with torch.inference_mode():
             result = evaluator.evaluate(
-                model=self.model,
-                mapped_triples=self.validation_triples_factory.mapped_triples,
+                model=model,
+                mapped_triples=self.validation_triples,
                 batch_size=self.eval_batch_size,
-                additional_filter_triples=[
-                    self.training_triples_factory.mapped_triples,
-                    self.validation_triples_factory.mapped_triples,
-                    self.test_triples_factory.mapped_triples
-                ]
+                # Both sides are ranked; with inverse triples the model scores heads
+                # as tails of the inverse relations, so this matches the bidirectional script
+                additional_filter_triples=[self.filter_triples]
             )
+        if use_cuda_timing:
+            end_event.record()
+            end_event.synchronize()
+            eval_time = start_event.elapsed_time(end_event) / 1000.0
+        else:
             eval_time = time.time() - start_time
+        
+        metrics = {
+            'epoch': epoch + 1,
+            'loss': float(epoch_loss),
+            'eval_time': eval_time,
+            'eval_type': 'full' if full_eval else 'sampled'
+        }
+        
+        # Read the realistic metrics over both sides directly instead of building the nested result dict;
+        # sampled ranks are not comparable to full ranks, so they go to their own columns
+        prefix = '' if full_eval else 'sampled_'
+        for k in [1, 3, 5, 10]:
+            metrics[f'{prefix}Hits@{k}'] = float(result.get_metric(f'both.realistic.hits_at_{k}'))
+        metrics[f'{prefix}MRR'] = float(result.get_metric('both.realistic.inverse_harmonic_mean_rank'))
+        metrics[f'{prefix}Mean_Rank'] = float(result.get_metric('both.realistic.mean_rank'))
+        
+        # Full 1-vs-all evaluation leaves large score buffers in the caching allocator;
+        # hand them back so the next epoch's training can use the memory
+        del result
+        if full_eval and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        
+        return metrics
+    
+    def _evaluate_on_stream(self, epoch, epoch_loss, full_eval):
+        """Evaluate the model snapshot on the side stream (runs in the worker thread)."""
+        with torch.cuda.stream(self.eval_stream):
+            metrics = self._evaluate(self.eval_model, epoch, epoch_loss, full_eval)
+            done = torch.cuda.Event()
+            done.record(self.eval_stream)
+        done.synchronize()
+        return metrics
+    
+    def _start_async_evaluation(self, epoch, epoch_loss, full_eval):
+        """Snapshot the current parameters and evaluate them while the next epoch trains."""
+        self.eval_stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(self.eval_stream):
+            self.eval_model.load_state_dict(self.model.state_dict())
+            copied = torch.cuda.Event()
+            copied.record(self.eval_stream)
+        # Training must not update the parameters before the snapshot is taken
+        torch.cuda.current_stream().wait_event(copied)
+        
+        future = self.executor.submit(self._evaluate_on_stream, epoch, epoch_loss, full_eval)
+        self.pending = (future, epoch, epoch_loss)
+    
+    def _collect_pending(self):
+        """Wait for the running asynchronous evaluation, if any, and record its metrics."""
+        if self.pending is None:
+            return
+        future, epoch, epoch_loss = self.pending
+        self.pending = None
+        try:
+            self._report(future.result())
+        except Exception as e:
+            self._log_error(epoch, epoch_loss, e)
+    
+    def close(self):
+        """Stop the evaluation worker, write the complete JSON and close the CSV (safe to call twice)."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.csv_file is not None:
+            self._save_json()
+            self.csv_file.close()
+            self.csv_file = None
+            self.csv_writer = None
+    
+    def post_train(self, losses, **kwargs):
+        """Called once training finishes; records the last evaluation and closes the log files."""
+        self._collect_pending()
+        self.close()
+        
+    def post_epoch(self, epoch: int, epoch_loss: float, **kwargs):
+        """Called after each training epoch."""
+        # The previous epoch's evaluation must finish before its model copy is overwritten
+        self._collect_pending()
+        
+        try:
+            # Move validation and filter triples to the model device once, not on every evaluation
+            if self.validation_triples is None:
+                device = self.model.device
+                self.validation_triples = self.validation_triples_factory.mapped_triples.to(device, non_blocking=True)
+                self.filter_triples = self.filter_triples.to(device, non_blocking=True)
             
-            # Extract metrics from nested structure
-            result_dict = result.to_dict()
-            metrics = {'epoch': epoch + 1, 'loss': float(epoch_loss), 'eval_time': eval_time}
-            
-            # Navigate to realistic metrics
-            if 'both' in result_dict and 'realistic' in result_dict['both']:
-                realistic_metrics = result_dict['both']['realistic']
-                
-                # Extract specific metrics
-                for k in [1, 3, 5, 10]:
-                    key = f'hits_at_{k}'
-                    if key in realistic_metrics:
-                        metrics[f'Hits@{k}'] = float(realistic_metrics[key])
-                
-                # Extract MRR and Mean Rank
-                if 'inverse_harmonic_mean_rank' in realistic_metrics:
-                    metrics['MRR'] = float(realistic_metrics['inverse_harmonic_mean_rank'])
-                
-                if 'mean_rank' in realistic_metrics:
-                    metrics['Mean_Rank'] = float(realistic_metrics['mean_rank'])
-            
-            self.logs.append(metrics)
-            
-            # Save to CSV and JSON after each epoch
-            df = pd.DataFrame(self.logs)
-            df.to_csv(self.csv_path, index=False)
-            
-            with open(self.json_path, 'w') as f:
-                json.dump(self.logs, f, indent=2)
-            
-            # Print current metrics
-            print(f"Epoch {epoch + 1} metrics (eval time: {eval_time:.1f}s):")
-            for metric, value in metrics.items():
-                if metric not in ['epoch', 'loss', 'eval_time']:
-                    if metric == 'Mean_Rank':
-                        print(f"  {metric}: {value:.1f}")
-                    else:
-                        print(f"  {metric}: {value:.4f}")
+            full_eval = (epoch + 1) % self.full_eval_every == 0
+            if self.async_eval:
+                self._start_async_evaluation(epoch, epoch_loss, full_eval)
+            else:
+                self._report(self._evaluate(self.model, epoch, epoch_loss, full_eval))
             
         except Exception as e:
-            print(f"Error during evaluation: {e}")
-            # Log error but continue training
-            error_metrics = {
-                'epoch': epoch + 1, 
-                'loss': float(epoch_loss), 
-                'error': str(e)
-            }
-            self.logs.append(error_metrics)
+            self._log_error(epoch, epoch_loss, e)
+
+def load_dataset(dataset_name, cache_dir, create_inverse_triples=False):
+    """
+    Load a PyKEEN dataset, using a pickled copy from a previous run when available.
+    
+    Args:
+        dataset_name: Name of the dataset (FB15k237 or CoDExSmall)
+        cache_dir: Directory holding the cached dataset file
+        create_inverse_triples: Whether to add inverse triples to the training factory
+        
+    Returns:
+        The loaded dataset
+    """
+    suffix = '_inverse' if create_inverse_triples else ''
+    cache_file = osp.join(cache_dir, f'{dataset_name}{suffix}.pt')
+    if osp.exists(cache_file):
+        print(f"Loading cached dataset from {cache_file}")
+        return torch.load(cache_file, weights_only=False)
+    
+    if dataset_name == "CoDExSmall":
+        from pykeen.datasets import CoDExSmall
+        dataset = CoDExSmall(create_inverse_triples=create_inverse_triples)
+    elif dataset_name == "FB15k237":
+        from pykeen.datasets import FB15k237
+        dataset = FB15k237(create_inverse_triples=create_inverse_triples)
+    else:
+        raise ValueError(f"Unsupported dataset: {dataset_name}")
+    
+    # Datasets load lazily; access the factories so the parsed triples end up in the cache
+    _ = (dataset.training, dataset.validation, dataset.testing)
+    torch.save(dataset, cache_file)
+    print(f"Cached dataset to {cache_file}")
+    return dataset
 
 def train_baseline_model_with_callbacks(
     output_dir, 
@@ -160,6 +466,13 @@ def train_baseline_model_with_callbacks(
     device = torch.device('cuda' if cuda_available else 'cpu')
     print(f"Using device: {device}")
     
+    # TF32 tensor-core matmuls for training and evaluation (Ampere+) are opt-in
+    if cuda_available and get_config('model.tf32'):
+        print("Using TF32 matmuls")
+        torch.set_float32_matmul_precision('high')
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+    
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
@@ -168,14 +481,8 @@ def train_baseline_model_with_callbacks(
     
     # Load the dataset
     dataset_name = dataset_name or get_config('dataset.name')
-    if dataset_name == "CoDExSmall":
-        from pykeen.datasets import CoDExSmall
-        dataset = CoDExSmall()
-    elif dataset_name == "FB15k237":
-        from pykeen.datasets import FB15k237
-        dataset = FB15k237()
-    else:
-        raise ValueError(f"Unsupported dataset: {dataset_name}")
+    # Inverse triples let LCWA predict heads as tails of inverse relations
+    dataset = load_dataset(dataset_name, output_dir, create_inverse_triples=True)
     
     # Print dataset info
     print(f"\nDataset: {dataset_name}")
@@ -205,25 +512,43 @@ def train_baseline_model_with_callbacks(
     custom_checkpoint_dir = os.path.join(output_dir, 'checkpoints')
     os.makedirs(custom_checkpoint_dir, exist_ok=True)
     
-    # Create callback for metric logging
-    callback = MetricLoggerCallback(output_dir, dataset.validation, dataset.training, dataset.testing, get_config('model.batch_size_eval'))
+    # Create callback for metric logging; the automatic batch-size search probes free GPU
+    # memory, so an evaluation running alongside training needs a fixed batch size
+    async_eval = get_config('model.async_eval')
+    eval_batch_size = get_config('model.batch_size_eval_async') if async_eval else get_config('model.batch_size_eval')
+    callback = MetricLoggerCallback(output_dir, dataset.validation, dataset.training, dataset.testing, eval_batch_size,
+                                    async_eval=async_eval)
+    callbacks = [callback]
+    
+    # Run the scoring functions in mixed precision on the GPU
+    autocast_dtype = get_config('model.autocast_dtype')
+    if cuda_available and autocast_dtype:
+        print(f"Using {autocast_dtype} autocast for scoring")
+        callbacks.append(AutocastCallback(getattr(torch, autocast_dtype)))
+    
+    # Compile the interaction function (torch.compile is only available in PyTorch 2.x)
+    if get_config('model.compile') and hasattr(torch, 'compile'):
+        print("Compiling model interaction with torch.compile")
+        callbacks.append(CompileCallback())
+    
+    # Save checkpoints every 5 epochs without blocking training on the disk write
+    checkpoint_path = osp.join(custom_checkpoint_dir, unique_checkpoint_name)
+    callbacks.append(AsyncCheckpointCallback(checkpoint_path, frequency=5))
     
     training_kwargs = {
         'num_epochs': max_epochs,
         'batch_size': get_config('model.batch_size_train'),
+        'num_workers': get_config('model.num_workers'),  # 0 = build batches in the main process
         'use_tqdm': True,  # Show progress bars
         'use_tqdm_batch': True,  # Show batch progress
-        'checkpoint_name': unique_checkpoint_name,  # Timestamp-based unique name
-        'checkpoint_directory': custom_checkpoint_dir,  # Custom directory
-        'checkpoint_frequency': 5,  # Save checkpoint every 5 epochs
         'tqdm_kwargs': {
             'mininterval': 2.0,  # Update progress bar at most every 2 seconds
             'miniters': 5,  # Update after at least 5 iterations
         },
-        'callbacks': [callback],  # Add our custom callback
+        'callbacks': callbacks,  # Add our custom callbacks
     }
     
-    print(f"Checkpoints will be saved to {custom_checkpoint_dir}/{unique_checkpoint_name}")
+    print(f"Checkpoints will be saved to {checkpoint_path}")
     
     optimizer_kwargs = {'lr': get_config('model.learning_rate')}
     
@@ -244,32 +569,33 @@ def train_baseline_model_with_callbacks(
     
     # Train the model 
     print(f"\nTraining {model_type} model with embedding_dim={embedding_dim}")
-    result = pipeline(
-        training=dataset.training,
-        testing=dataset.testing,
-        validation=dataset.validation,
-        model=model_type,
-        loss='crossentropy',  
-        model_kwargs=model_kwargs,
-        training_kwargs=training_kwargs,
-        optimizer='Adam',
-        optimizer_kwargs=optimizer_kwargs,
-        lr_scheduler='ExponentialLR',
-        lr_scheduler_kwargs=lr_scheduler_kwargs,
-        negative_sampler='basic',
-        negative_sampler_kwargs={
-            'num_negs_per_pos': get_config('sampling.negative_o'),
-        },
-        evaluation_kwargs=evaluation_kwargs,
-        random_seed=int(os.environ.get("SEED", 42)),
-        device=device,  # Add GPU support
-        stopper='early',
-        stopper_kwargs=stopper_kwargs
-    )
+    try:
+        result = pipeline(
+            training=dataset.training,
+            testing=dataset.testing,
+            validation=dataset.validation,
+            model=model_type,
+            loss='crossentropy',  
+            model_kwargs=model_kwargs,
+            training_kwargs=training_kwargs,
+            optimizer='Adam',  # Dense on purpose: LCWA scores all tails, so every entity row gets a gradient
+            optimizer_kwargs=optimizer_kwargs,
+            lr_scheduler='ExponentialLR',
+            lr_scheduler_kwargs=lr_scheduler_kwargs,
+            training_loop='LCWA',  # 1-N scoring: each (h, r) batch is scored against all tails at once
+            evaluation_kwargs=evaluation_kwargs,
+            random_seed=int(os.environ.get("SEED", 42)),
+            device=device,  # Add GPU support
+            stopper='early',
+            stopper_kwargs=stopper_kwargs
+        )
+    finally:
+        # Release the metrics CSV even if training raises (OOM, interrupt, stopper error)
+        callback.close()
     
-    # Save the model
-    model_file = osp.join(output_dir, 'baseline_trained_model.pkl')
-    torch.save(result.model, model_file)
+    # Save the model weights only; rebuild with ComplEx(...) and load_state_dict to reuse them
+    model_file = osp.join(output_dir, 'baseline_trained_model.pt')
+    torch.save(result.model.state_dict(), model_file)
     print(f"Saved trained model to {model_file}")
     
     # Save final metrics
@@ -7,16 +7,20 @@ Based on complex_extended_bidirectional.py but uses PyKEEN callbacks for metric
 import os
 import os.path as osp
 import logging
+import contextlib
+import gc
+import csv
 import torch
 import numpy as np
-import pandas as pd
 import argparse
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Any
 from collections import defaultdict
 from pykeen.pipeline import pipeline
 from pykeen.triples import TriplesFactory
 from pykeen.training.callbacks import TrainingCallback
+from pykeen.evaluation import RankBasedEvaluator
 import time
 import json
 
@@ -34,13 +38,15 @@ def get_config(key, default=None):
         'model.batch_size_train': 1000,  
         'model.batch_size_eval': 256,  
         'model.learning_rate': 0.1,  
-        'sampling.negative_o': 1000,  
         'model.dropout': 0.5,  
         'model.regularize_weight': 0.05,  
         'model.relation_dropout': 0.22684140529516872,  
         'model.relation_regularize_weight': 8.266519211068944e-14,  
+        'model.eval_autocast_dtype': None,  # FP32 evaluation, as in the baseline; float16/bfloat16 can tie ranks
+        'model.tf32': False,  # Set True to allow TF32 tensor-core matmuls on CUDA (Ampere+)
         'api.url': 'http://localhost:8080/recommender',
         'api.timeout': 30,  # API request timeout in seconds
+        'api.max_workers': 32,  # Number of concurrent API requests
         'probability_threshold': 0.5,  # Probability threshold for recommendations
         'max_recommendations': 10,  
         'max_new_triples': 10000000,  
@@ -49,46 +55,89 @@ def get_config(key, default=None):
     }
     return configs.get(key, default)
 
+# Columns of the per-epoch metrics CSV
+METRIC_FIELDNAMES = [
+    'epoch', 'loss', 'eval_time',
+    'Hits@1', 'Hits@3', 'Hits@5', 'Hits@10', 'MRR', 'Mean_Rank', 'error'
+]
+
 class MetricLoggerCallback(TrainingCallback):
     """Custom callback to log evaluation metrics after each epoch."""
     
-    def __init__(self, output_dir, validation_triples_factory, training_triples_factory, test_triples_factory, eval_batch_size=256):
+    def __init__(self, output_dir, validation_triples_factory, training_triples_factory, test_triples_factory, eval_batch_size=256,
+                 eval_frequency=10, autocast_dtype=None):
         super().__init__()
         self.output_dir = output_dir
         self.validation_triples_factory = validation_triples_factory
         self.training_triples_factory = training_triples_factory
         self.test_triples_factory = test_triples_factory
         self.eval_batch_size = eval_batch_size
+        self.eval_frequency = eval_frequency
+        # Mixed precision only applies on CUDA
+        self.autocast_dtype = getattr(torch, autocast_dtype) if autocast_dtype and torch.cuda.is_available() else None
         self.logs = []
+        
+        # Evaluator and filter triples are the same for every evaluation, so build them once
+        self.evaluator = RankBasedEvaluator()
+        self.filter_triples = torch.cat([
+            training_triples_factory.mapped_triples,
+            validation_triples_factory.mapped_triples,
+            test_triples_factory.mapped_triples
+        ]).unique(dim=0)
         self.csv_path = osp.join(output_dir, 'bidirectional_epoch_metrics.csv')
         self.json_path = osp.join(output_dir, 'bidirectional_epoch_metrics.json')
         
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
         
+        # The CSV is opened on the first row and kept open to append one row per evaluation
+        # instead of rewriting it; close() releases it, also when training fails
+        self.csv_file = None
+        self.csv_writer = None
+    
+    def _log_epoch(self, metrics):
+        """Record one evaluation and append it to the CSV."""
+        self.logs.append(metrics)
+        if self.csv_file is None:
+            self.csv_file = open(self.csv_path, 'w', newline='')
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=METRIC_FIELDNAMES, restval='', extrasaction='ignore')
+            self.csv_writer.writeheader()
+        self.csv_writer.writerow(metrics)
+        self.csv_file.flush()
+    
+    def close(self):
+        """Write the JSON and close the CSV (safe to call twice)."""
+        if self.csv_file is not None:
+            with open(self.json_path, 'w') as f:
+                json.dump(self.logs, f, indent=2)
+            self.csv_file.close()
+            self.csv_file = None
+            self.csv_writer = None
+    
+    def post_train(self, losses, **kwargs):
+        """Called once training finishes; writes the JSON and closes the CSV."""
+        self.close()
+        
     def post_epoch(self, epoch: int, epoch_loss: float, **kwargs):
         """Called after each training epoch."""
+        # Evaluate only every eval_frequency epochs (same cadence as the early stopper)
+        if (epoch + 1) % self.eval_frequency != 0:
+            return
+        
         print(f"\nLogging metrics for epoch {epoch + 1}...")
         
         try:
-            # Import evaluator here to avoid circular imports
-            from pykeen.evaluation import RankBasedEvaluator
-            
-            # Create evaluator if not available
-            evaluator = RankBasedEvaluator()
-            
             # Evaluate model on validation set with proper filtering
             start_time = time.time()
-            result = evaluator.evaluate(
-                model=self.model,
-                mapped_triples=self.validation_triples_factory.mapped_triples,
-                batch_size=self.eval_batch_size,
-                additional_filter_triples=[
-                    self.training_triples_factory.mapped_triples,
-                    self.validation_triples_factory.mapped_triples,
-                    self.test_triples_factory.mapped_triples
-                ]
-            )
+            # Score in mixed precision when enabled; ranks only need the ordering of the scores
+            autocast = torch.autocast('cuda', dtype=self.autocast_dtype) if self.autocast_dtype else contextlib.nullcontext()
+            with torch.inference_mode(), autocast:
+                result = self.evaluator.evaluate(
+                    model=self.model,
+                    mapped_triples=self.validation_triples_factory.mapped_triples,
+                    batch_size=self.eval_batch_size,
+                    additional_filter_triples=[self.filter_triples]
+                )
             eval_time = time.time() - start_time
             
             # Extract metrics from nested structure
@@ -112,14 +161,7 @@ class MetricLoggerCallback(TrainingCallback):
                 if 'mean_rank' in realistic_metrics:
                     metrics['Mean_Rank'] = float(realistic_metrics['mean_rank'])
             
-            self.logs.append(metrics)
-            
-            # Save to CSV and JSON after each epoch
-            df = pd.DataFrame(self.logs)
-            df.to_csv(self.csv_path, index=False)
-            
-            with open(self.json_path, 'w') as f:
-                json.dump(self.logs, f, indent=2)
+            self._log_epoch(metrics)
             
             # Print current metrics
             print(f"Epoch {epoch + 1} metrics (eval time: {eval_time:.1f}s):")
@@ -138,20 +180,44 @@ class MetricLoggerCallback(TrainingCallback):
                 'loss': float(epoch_loss), 
                 'error': str(e)
             }
-            self.logs.append(error_metrics)
+            self._log_epoch(error_metrics)
+
+def build_relation_index(triples: torch.Tensor, entity_column: int) -> Dict[int, List[int]]:
+    """
+    Group the distinct relation ids of the triples by entity in a single pass.
+    
+    Args:
+        triples: Mapped triples tensor of shape (n, 3)
+        entity_column: Column of the entity to group by (0 = head, 2 = tail)
+        
+    Returns:
+        Dictionary mapping entity id to the sorted distinct relation ids of its triples
+    """
+    # Unique (entity, relation) pairs come back sorted by entity, then relation
+    pairs = np.unique(triples.cpu().numpy()[:, [entity_column, 1]], axis=0)
+    entities, starts = np.unique(pairs[:, 0], return_index=True)
+    return {
+        int(entity_id): relations.tolist()
+        for entity_id, relations in zip(entities, np.split(pairs[:, 1], starts[1:]))
+    }
 
-def get_entity_outgoing_properties(triples: torch.Tensor, entity_id: int, id_to_relation: Dict[int, str]) -> set:
+def build_id_to_relation(relation_to_id: Dict[str, int]) -> List[str]:
+    """Invert a relation-to-id mapping into a list of labels indexed by relation id."""
+    id_to_relation = [None] * len(relation_to_id)
+    for label, relation_id in relation_to_id.items():
+        id_to_relation[relation_id] = label
+    return id_to_relation
+
+def get_entity_outgoing_properties(relations_by_head: Dict[int, List[int]], entity_id: int, id_to_relation: List[str]) -> set:
     """Get all outgoing properties (relations) where the entity is the head."""
-    head_triples = triples[triples[:, 0] == entity_id]
-    return {f"O:{id_to_relation[rel_id.item()]}" for rel_id in head_triples[:, 1]}
+    return {f"O:{id_to_relation[rel_id]}" for rel_id in relations_by_head.get(entity_id, [])}
 
-def get_entity_incoming_properties(triples: torch.Tensor, entity_id: int, id_to_relation: Dict[int, str]) -> set:
+def get_entity_incoming_properties(relations_by_tail: Dict[int, List[int]], entity_id: int, id_to_relation: List[str]) -> set:
     """Get all incoming properties (relations) where the entity is the tail."""
-    tail_triples = triples[triples[:, 2] == entity_id]
-    return {f"I:{id_to_relation[rel_id.item()]}" for rel_id in tail_triples[:, 1]}
+    return {f"I:{id_to_relation[rel_id]}" for rel_id in relations_by_tail.get(entity_id, [])}
 
-def get_recommendations(properties: List[str], api_url: str = None) -> List[Dict[str, Any]]:
-    """Get property recommendations from the API."""
+def get_recommendations(properties: List[str], api_url: str = None, session: requests.Session = None) -> List[Dict[str, Any]]:
+    """Get property recommendations from the API, reusing the session's connections if given."""
     api_url = api_url or get_config('api.url')
     api_timeout = get_config('api.timeout')
     
@@ -162,7 +228,8 @@ def get_recommendations(properties: List[str], api_url: str = None) -> List[Dict
         }
         
         print(f"Sending request to {api_url} with {len(properties)} properties")
-        response = requests.post(api_url, json=data, timeout=api_timeout)
+        post = session.post if session is not None else requests.post
+        response = post(api_url, json=data, timeout=api_timeout)
         response.raise_for_status()
         
         recommendations = response.json().get("recommendations", [])
@@ -176,6 +243,39 @@ def get_recommendations(properties: List[str], api_url: str = None) -> List[Dict
         logger.error(f"Error processing recommendations: {str(e)}")
         return []
 
+def create_pooled_session(max_workers: int) -> requests.Session:
+    """
+    Create a keep-alive session whose connection pool holds one connection per worker thread.
+    
+    Same pool and retry settings as create_pooled_session in weigthed_training/leave_one_out_scoring.py
+    (the script directories are not importable from each other); retries are left to the callers.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_recommendations_batch(property_lists: List[List[str]], api_url: str = None, max_workers: int = None) -> List[List[Dict[str, Any]]]:
+    """
+    Get recommendations for many property lists with concurrent API requests.
+    
+    Args:
+        property_lists: One property list per request
+        api_url: URL of the recommender API
+        max_workers: Maximum number of requests in flight
+        
+    Returns:
+        List of recommendation lists, in the same order as property_lists
+    """
+    max_workers = max_workers or get_config('api.max_workers')
+    
+    # One pooled session shared by all worker threads
+    session = create_pooled_session(max_workers)
+    
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda properties: get_recommendations(properties, api_url, session), property_lists))
+
 def process_recommendations(
     recommendations: List[Dict[str, Any]],
     threshold: float = None,
@@ -185,24 +285,25 @@ def process_recommendations(
     threshold = threshold or get_config('probability_threshold')
     max_recommendations = max_recommendations or get_config('max_recommendations')
     
-    filtered_recommendations = [
-        (rec['property'], rec['probability'])
-        for rec in recommendations
-        if rec['probability'] >= threshold
-    ]
+    if not recommendations:
+        return []
+    
+    properties = np.array([rec['property'] for rec in recommendations], dtype=object)
+    probabilities = np.array([rec['probability'] for rec in recommendations], dtype=float)
     
-    # Sort by probability in descending order
-    filtered_recommendations.sort(key=lambda x: x[1], reverse=True)
+    # Keep recommendations above the threshold
+    mask = probabilities >= threshold
+    properties, probabilities = properties[mask], probabilities[mask]
     
-    # Take top N recommendations
-    result = filtered_recommendations[:max_recommendations]
-    return result
+    # Take top N recommendations (stable, so ties keep the API order)
+    top = np.argsort(-probabilities, kind='stable')[:max_recommendations]
+    return [(properties[i], float(probabilities[i])) for i in top]
 
 def create_artificial_triples(
     dataset,
     probability_threshold: float = None,
     max_entities: int = 10000000
-) -> Tuple[List[torch.Tensor], int]:
+) -> Tuple[torch.Tensor, int]:
     """Create artificial triples based on recommendations using both incoming and outgoing properties."""
     probability_threshold = probability_threshold or get_config('probability_threshold')
     max_new_triples = get_config('max_new_triples')
@@ -210,91 +311,128 @@ def create_artificial_triples(
     print("\n=== Creating Artificial Triples (Bidirectional) ===")
     
     # Get all unique entities (both head and tail positions)
-    triples = dataset.training.mapped_triples
-    all_entities = set(triples[:, 0].tolist()).union(set(triples[:, 2].tolist()))
+    # Everything here is CPU work (indexing and HTTP), so keep the triples off the GPU
+    triples = dataset.training.mapped_triples.cpu()
+    all_entities = torch.unique(torch.cat([triples[:, 0], triples[:, 2]])).tolist()
     print(f"Number of unique entities (head + tail): {len(all_entities)}")
     
-    # Create id_to_relation mapping
-    id_to_relation = {v: k for k, v in dataset.relation_to_id.items()}
-    relation_to_id = dataset.relation_to_id.copy()
+    # Relation labels indexed by id (read-only, so the dataset mapping is used directly for the reverse)
+    id_to_relation = build_id_to_relation(dataset.relation_to_id)
+    relation_to_id = dataset.relation_to_id
     
-    # Set next entity ID
-    next_entity_id = max(dataset.entity_to_id.values()) + 1
+    # Set next entity ID (PyKEEN entity ids are contiguous, 0 .. num_entities - 1)
+    next_entity_id = dataset.training.num_entities
     
     # Limit entities for processing (for faster execution)
-    entities_to_process = list(all_entities)[:max_entities]
+    entities_to_process = all_entities[:max_entities]
     print(f"Processing first {len(entities_to_process)} entities (limited from {len(all_entities)} total)")
     
+    # Index relations by head and by tail once instead of scanning all triples per entity
+    relations_by_head = build_relation_index(triples, 0)
+    relations_by_tail = build_relation_index(triples, 2)
+    
     # Group properties by entity (both incoming and outgoing)
     entity_properties = defaultdict(dict)
     for entity_id in entities_to_process:
-        outgoing_props = get_entity_outgoing_properties(triples, entity_id, id_to_relation)
-        incoming_props = get_entity_incoming_properties(triples, entity_id, id_to_relation)
+        outgoing_props = get_entity_outgoing_properties(relations_by_head, entity_id, id_to_relation)
+        incoming_props = get_entity_incoming_properties(relations_by_tail, entity_id, id_to_relation)
         
         entity_properties[entity_id]['outgoing'] = outgoing_props
         entity_properties[entity_id]['incoming'] = incoming_props
         entity_properties[entity_id]['all'] = outgoing_props.union(incoming_props)
     
-    new_triples = []
+    # Columns of the new triples, turned into a single tensor at the end
+    heads, relations, tails = [], [], []
     triple_count = 0
     property_to_entity_id = {}
     
-    # Process each entity and its properties
-    for entity_id, props in entity_properties.items():
+    # Entities with the same property set get the same recommendations,
+    # so request each distinct set only once (concurrently)
+    entity_property_sets = [
+        (entity_id, frozenset(props['all']))
+        for entity_id, props in entity_properties.items()
+        if props['all']
+    ]
+    distinct_property_sets = list(dict.fromkeys(property_set for _, property_set in entity_property_sets))
+    print(f"\nGetting recommendations for up to {len(entity_property_sets)} entities "
+          f"({len(distinct_property_sets)} distinct property sets)")
+    
+    # Request recommendations chunk by chunk (each chunk concurrently), so once
+    # max_new_triples is reached no more API calls are made for entities that would be dropped
+    rec_cache = {}
+    chunk_size = 4 * get_config('api.max_workers')
+    for start in range(0, len(entity_property_sets), chunk_size):
         if triple_count >= max_new_triples:
             break
+        chunk = entity_property_sets[start:start + chunk_size]
+        missing_property_sets = list(dict.fromkeys(
+            property_set for _, property_set in chunk if property_set not in rec_cache
+        ))
+        rec_cache.update(zip(
+            missing_property_sets,
+            get_recommendations_batch([list(property_set) for property_set in missing_property_sets])
+        ))
         
-        property_list = list(props['all'])
-        if not property_list: 
-            continue
-        
-        print(f"\nGetting recommendations for entity {entity_id} (has {len(property_list)} total properties)")
-        recommendations = get_recommendations(property_list)
-        filtered_recommendations = process_recommendations(recommendations, threshold=probability_threshold)
-        filtered_recommendations = filtered_recommendations[:len(property_list)]
-        
-        # Create new triples for each recommendation
-        for new_prop, probability in filtered_recommendations:
+        # Process each entity of the chunk and its properties
+        for entity_id, property_set in chunk:
             if triple_count >= max_new_triples:
                 break
             
-            # Check if property has prefix and extract the actual property name
-            is_incoming = False
-            if new_prop.startswith("I:"):
-                is_incoming = True
-                prop_name = new_prop[2:]
-            elif new_prop.startswith("O:"):
-                prop_name = new_prop[2:]
-            else:
-                prop_name = new_prop
-                
-            # For FB15k237, we expect full paths in the actual property name
-            if not prop_name.startswith('/'):
-                print(f"Skipping non-path property {prop_name} for FB15k237 dataset")
-                continue
-            
-            # Get the numeric relation ID for the property name (without prefix)
-            if prop_name not in relation_to_id:
-                print(f"Property not in known relations, skipping: {prop_name}")
-                continue
+            recommendations = rec_cache[property_set]
+            filtered_recommendations = process_recommendations(recommendations, threshold=probability_threshold)
+            filtered_recommendations = filtered_recommendations[:len(property_set)]
             
-            new_relation_id = relation_to_id[prop_name]
-            
-            # Get or create entity ID for this property
-            if prop_name not in property_to_entity_id:
-                property_to_entity_id[prop_name] = next_entity_id
-                next_entity_id += 1
-            
-            # Create new triple with proper directionality based on prefix
-            if is_incoming:
-                new_triple = torch.tensor([property_to_entity_id[prop_name], new_relation_id, entity_id])
-                print(f"Created incoming triple: ({property_to_entity_id[prop_name]}) --{prop_name}--> ({entity_id})")
-            else:
-                new_triple = torch.tensor([entity_id, new_relation_id, property_to_entity_id[prop_name]])
-                print(f"Created outgoing triple: ({entity_id}) --{prop_name}--> ({property_to_entity_id[prop_name]})")
-            
-            new_triples.append(new_triple)
-            triple_count += 1
+            # Create new triples for each recommendation
+            for new_prop, probability in filtered_recommendations:
+                if triple_count >= max_new_triples:
+                    break
+                
+                # Check if property has prefix and extract the actual property name
+                is_incoming = False
+                if new_prop.startswith("I:"):
+                    is_incoming = True
+                    prop_name = new_prop[2:]
+                elif new_prop.startswith("O:"):
+                    prop_name = new_prop[2:]
+                else:
+                    prop_name = new_prop
+                
+                # For FB15k237, we expect full paths in the actual property name
+                if not prop_name.startswith('/'):
+                    print(f"Skipping non-path property {prop_name} for FB15k237 dataset")
+                    continue
+                
+                # Get the numeric relation ID for the property name (without prefix)
+                if prop_name not in relation_to_id:
+                    print(f"Property not in known relations, skipping: {prop_name}")
+                    continue
+                
+                new_relation_id = relation_to_id[prop_name]
+                
+                # Get or create entity ID for this property
+                if prop_name not in property_to_entity_id:
+                    property_to_entity_id[prop_name] = next_entity_id
+                    next_entity_id += 1
+                
+                # Create new triple with proper directionality based on prefix
+                property_entity_id = property_to_entity_id[prop_name]
+                if is_incoming:
+                    heads.append(property_entity_id)
+                    tails.append(entity_id)
+                    logger.debug("Created incoming triple: (%s) --%s--> (%s)", property_entity_id, prop_name, entity_id)
+                else:
+                    heads.append(entity_id)
+                    tails.append(property_entity_id)
+                    logger.debug("Created outgoing triple: (%s) --%s--> (%s)", entity_id, prop_name, property_entity_id)
+                relations.append(new_relation_id)
+                triple_count += 1
+    
+    # Stack the columns as int64, so an empty result is still a (0, 3) long tensor
+    new_triples = torch.from_numpy(np.asarray([heads, relations, tails], dtype=np.int64).T.copy())
+    
+    # Release the per-entity intermediates before the memory-hungry training starts
+    del entity_properties, relations_by_head, relations_by_tail, rec_cache
+    gc.collect()
     
     print(f"\nCreated {len(new_triples)} artificial triples")
     print(f"Final next_entity_id: {next_entity_id}")
@@ -370,52 +508,22 @@ def train_bidirectional_model_with_callbacks(
     )
     
     # Combine original and artificial triples
-    if artificial_triples:
+    if len(artificial_triples) > 0:
         print(f"\nCombining {len(dataset.training.mapped_triples)} original + {len(artificial_triples)} artificial triples")
         
-        # Convert to labeled format for TriplesFactory
-        id_to_entity = {v: k for k, v in dataset.training.entity_to_id.items()}
-        id_to_relation = {v: k for k, v in dataset.training.relation_to_id.items()}
-        
-        # Convert original triples
-        original_labeled_triples = []
-        for triple in dataset.training.mapped_triples:
-            head_id, rel_id, tail_id = triple.tolist()
-            head_label = id_to_entity[head_id]
-            rel_label = id_to_relation[rel_id]
-            tail_label = id_to_entity[tail_id]
-            original_labeled_triples.append((head_label, rel_label, tail_label))
-        
-        # Convert artificial triples (create new entity labels for artificial entities)
-        artificial_labeled_triples = []
-        for triple in artificial_triples:
-            head_id, rel_id, tail_id = triple.tolist()
-            
-            # Handle head entity
-            if head_id in id_to_entity:
-                head_label = id_to_entity[head_id]
-            else:
-                head_label = f"artificial_entity_{head_id}"
-                id_to_entity[head_id] = head_label
-            
-            # Handle relation (should always be original)
-            rel_label = id_to_relation[rel_id]
-            
-            # Handle tail entity
-            if tail_id in id_to_entity:
-                tail_label = id_to_entity[tail_id]
-            else:
-                tail_label = f"artificial_entity_{tail_id}"
-                id_to_entity[tail_id] = tail_label
-            
-            artificial_labeled_triples.append((head_label, rel_label, tail_label))
-        
-        # Combine all labeled triples
-        all_labeled_triples = original_labeled_triples + artificial_labeled_triples
+        # Original entities keep their ids (so validation/test triples stay valid);
+        # the new property entities get labels for the ids assigned to them
+        entity_to_id = dict(dataset.training.entity_to_id)
+        entity_to_id.update({
+            f"artificial_entity_{i}": i
+            for i in range(dataset.training.num_entities, next_entity_id)
+        })
         
-        # Create extended TriplesFactory
-        extended_training = TriplesFactory.from_labeled_triples(
-            np.array(all_labeled_triples, dtype=str),
+        # Create extended TriplesFactory directly from the mapped ids
+        extended_training = TriplesFactory(
+            mapped_triples=torch.cat([dataset.training.mapped_triples, artificial_triples]),
+            entity_to_id=entity_to_id,
+            relation_to_id=dataset.training.relation_to_id,
             create_inverse_triples=True
         )
         
@@ -445,7 +553,8 @@ def train_bidirectional_model_with_callbacks(
     os.makedirs(custom_checkpoint_dir, exist_ok=True)
     
     # Create callback for metric logging
-    callback = MetricLoggerCallback(output_dir, dataset.validation, extended_training, dataset.testing, get_config('model.batch_size_eval'))
+    callback = MetricLoggerCallback(output_dir, dataset.validation, extended_training, dataset.testing, get_config('model.batch_size_eval'),
+                                    autocast_dtype=get_config('model.eval_autocast_dtype'))
     
     training_kwargs = {
         'num_epochs': max_epochs,
@@ -481,34 +590,53 @@ def train_bidirectional_model_with_callbacks(
         'batch_size': get_config('model.batch_size_eval'),
     }
     
+    # TF32 tensor-core matmuls for training and evaluation (Ampere+) are opt-in
+    if cuda_available and get_config('model.tf32'):
+        print("Using TF32 matmuls")
+        torch.set_float32_matmul_precision('high')
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+    
     # Train the model 
     print(f"\nTraining {model_type} model with embedding_dim={embedding_dim} on extended dataset")
-    result = pipeline(
-        training=extended_training,
-        testing=dataset.testing,
-        validation=dataset.validation,
-        model=model_type,
-        loss='crossentropy',  
-        model_kwargs=model_kwargs,
-        training_kwargs=training_kwargs,
-        optimizer='Adam',
-        optimizer_kwargs=optimizer_kwargs,
-        lr_scheduler='ExponentialLR',
-        lr_scheduler_kwargs=lr_scheduler_kwargs,
-        negative_sampler='basic',
-        negative_sampler_kwargs={
-            'num_negs_per_pos': get_config('sampling.negative_o'),
+    try:
+        result = pipeline(
+            training=extended_training,
+            testing=dataset.testing,
+            validation=dataset.validation,
+            model=model_type,
+            loss='crossentropy',  
+            model_kwargs=model_kwargs,
+            training_kwargs=training_kwargs,
+            optimizer='Adam',
+            optimizer_kwargs=optimizer_kwargs,
+            lr_scheduler='ExponentialLR',
+            lr_scheduler_kwargs=lr_scheduler_kwargs,
+            training_loop='LCWA',  # 1-N scoring: each (h, r) batch is scored against all tails at once
+            evaluation_kwargs=evaluation_kwargs,
+            random_seed=int(os.environ.get("SEED", 42)),
+            device=device,
+            stopper='early',
+            stopper_kwargs=stopper_kwargs
+        )
+    finally:
+        # Release the metrics CSV even if training raises (OOM, interrupt, stopper error)
+        callback.close()
+    
+    # Save the weights with the mappings and settings needed to rebuild the model
+    model_file = osp.join(output_dir, 'bidirectional_trained_model.pt')
+    torch.save({
+        'state_dict': result.model.state_dict(),
+        'entity_to_id': extended_training.entity_to_id,
+        'relation_to_id': extended_training.relation_to_id,
+        'config': {
+            'dataset': dataset_name,
+            'model_type': model_type,
+            'embedding_dim': embedding_dim,
+            'probability_threshold': probability_threshold,
+            'max_entities': max_entities,
         },
-        evaluation_kwargs=evaluation_kwargs,
-        random_seed=int(os.environ.get("SEED", 42)),
-        device=device,
-        stopper='early',
-        stopper_kwargs=stopper_kwargs
-    )
-    
-    # Save the model
-    model_file = osp.join(output_dir, 'bidirectional_trained_model.pkl')
-    torch.save(result.model, model_file)
+    }, model_file)
     print(f"Saved trained model to {model_file}")
     
     # Save final metrics
@@ -519,8 +647,8 @@ def train_bidirectional_model_with_callbacks(
         f.write(f"Embedding Dim: {embedding_dim}\n")
         f.write(f"Probability Threshold: {probability_threshold}\n")
         f.write(f"Max Entities Processed: {max_entities}\n")
-        f.write(f"Artificial Triples Created: {len(artificial_triples) if artificial_triples else 0}\n")
-        f.write(f"Epochs trained: {len(callback.logs)}\n")
+        f.write(f"Artificial Triples Created: {len(artificial_triples)}\n")
+        f.write(f"Epochs trained: {len(result.losses)}\n")
         f.write(f"Final Test Metrics:\n")
         
         # Format metrics
@@ -534,7 +662,7 @@ def train_bidirectional_model_with_callbacks(
     
     print(f"Saved metrics to {metrics_file}")
     print(f"Epoch-by-epoch metrics saved to {callback.csv_path}")
-    print(f"Training completed with {len(callback.logs)} epochs logged!")
+    print(f"Training completed after {len(result.losses)} epochs with {len(callback.logs)} evaluations logged!")
     
     return result.model, output_dir, callback.logs
 
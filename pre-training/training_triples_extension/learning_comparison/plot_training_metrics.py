@@ -23,19 +23,25 @@ def load_training_metrics(baseline_csv: str, bidirectional_csv: str):
     bidirectional_df = None
     
     if os.path.exists(baseline_csv):
-        baseline_df = pd.read_csv(baseline_csv)
+        baseline_df = keep_full_evaluations(pd.read_csv(baseline_csv))
         print(f"Loaded baseline metrics: {len(baseline_df)} epochs")
     else:
         print(f"Warning: Baseline CSV not found: {baseline_csv}")
     
     if os.path.exists(bidirectional_csv):
-        bidirectional_df = pd.read_csv(bidirectional_csv)
+        bidirectional_df = keep_full_evaluations(pd.read_csv(bidirectional_csv))
         print(f"Loaded bidirectional metrics: {len(bidirectional_df)} epochs")
     else:
         print(f"Warning: Bidirectional CSV not found: {bidirectional_csv}")
     
     return baseline_df, bidirectional_df
 
+def keep_full_evaluations(df):
+    """Drop rows evaluated against sampled negatives, which are not comparable to full ranks."""
+    if df is not None and 'eval_type' in df.columns:
+        df = df[df['eval_type'] == 'full'].reset_index(drop=True)
+    return df
+
 def plot_metric_comparison(baseline_df, bidirectional_df, metric_name, ax, ylabel=None):
     """Plot comparison of a single metric."""
     
@@ -7,8 +7,12 @@ import os
 import sys
 import time
 import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import torch
+
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
@@ -17,6 +21,47 @@ from complex_baseline_with_callbacks import train_baseline_model_with_callbacks
 from complex_bidirectional_with_callbacks import train_bidirectional_model_with_callbacks
 from plot_training_metrics import create_training_comparison_plots
 
+def _pin_to_gpu(gpu):
+    """Restrict the current process to a single GPU (must run before CUDA is initialized)."""
+    if gpu is not None:
+        os.environ["CUDA_VISIBLE_DEVICES"] = str(gpu)
+
+def _train_baseline(output_dir, max_epochs, gpu=None):
+    """Train the baseline model and return its duration and epoch logs."""
+    _pin_to_gpu(gpu)
+    start_time = time.time()
+    try:
+        _, _, logs = train_baseline_model_with_callbacks(
+            output_dir=output_dir,
+            max_epochs=max_epochs
+        )
+        duration = time.time() - start_time
+        print(f"Baseline training completed in {duration:.1f}s ({len(logs)} epochs)")
+    except Exception as e:
+        print(f"Baseline training failed: {str(e)}")
+        duration = time.time() - start_time
+        logs = []
+    return duration, logs
+
+def _train_bidirectional(output_dir, max_epochs, probability_threshold, max_entities, gpu=None):
+    """Train the bidirectional model and return its duration and epoch logs."""
+    _pin_to_gpu(gpu)
+    start_time = time.time()
+    try:
+        _, _, logs = train_bidirectional_model_with_callbacks(
+            output_dir=output_dir,
+            max_epochs=max_epochs,
+            probability_threshold=probability_threshold,
+            max_entities=max_entities
+        )
+        duration = time.time() - start_time
+        print(f"Bidirectional training completed in {duration:.1f}s ({len(logs)} epochs)")
+    except Exception as e:
+        print(f"Bidirectional training failed: {str(e)}")
+        duration = time.time() - start_time
+        logs = []
+    return duration, logs
+
 def run_training_comparison(
     baseline_output_dir="models/baseline_complex_with_callbacks",
     bidirectional_output_dir="models/bidirectional_complex_with_callbacks",
@@ -39,41 +84,33 @@ def run_training_comparison(
     
     total_start_time = time.time()
     
-    # Step 1: Train baseline model
-    print("\n STEP 1: Training Baseline ComplEx Model")
-    print("-" * 50)
-    
-    baseline_start_time = time.time()
-    try:
-        baseline_model, baseline_dir, baseline_logs = train_baseline_model_with_callbacks(
-            output_dir=baseline_output_dir,
-            max_epochs=max_epochs
-        )
-        baseline_duration = time.time() - baseline_start_time
-        print(f"Baseline training completed in {baseline_duration:.1f}s ({len(baseline_logs)} epochs)")
-    except Exception as e:
-        print(f"Baseline training failed: {str(e)}")
-        baseline_duration = time.time() - baseline_start_time
-        baseline_logs = []
-    
-    # Step 2: Train bidirectional model
-    print("\nSTEP 2: Training Bidirectional ComplEx Model")
-    print("-" * 50)
-    
-    bidirectional_start_time = time.time()
-    try:
-        bidirectional_model, bidirectional_dir, bidirectional_logs = train_bidirectional_model_with_callbacks(
-            output_dir=bidirectional_output_dir,
-            max_epochs=max_epochs,
-            probability_threshold=probability_threshold,
-            max_entities=max_entities
+    if torch.cuda.device_count() >= 2:
+        # The two trainings are independent, so run them side by side on separate GPUs.
+        # Workers are spawned (not forked) so that each one initializes CUDA on its own device.
+        print("\nSTEPS 1-2: Training Baseline and Bidirectional ComplEx Models in parallel (GPUs 0 and 1)")
+        print("-" * 50)
+        
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as executor:
+            baseline_future = executor.submit(_train_baseline, baseline_output_dir, max_epochs, 0)
+            bidirectional_future = executor.submit(
+                _train_bidirectional, bidirectional_output_dir, max_epochs, probability_threshold, max_entities, 1
+            )
+            baseline_duration, baseline_logs = baseline_future.result()
+            bidirectional_duration, bidirectional_logs = bidirectional_future.result()
+    else:
+        # Step 1: Train baseline model
+        print("\n STEP 1: Training Baseline ComplEx Model")
+        print("-" * 50)
+        
+        baseline_duration, baseline_logs = _train_baseline(baseline_output_dir, max_epochs)
+        
+        # Step 2: Train bidirectional model
+        print("\nSTEP 2: Training Bidirectional ComplEx Model")
+        print("-" * 50)
+        
+        bidirectional_duration, bidirectional_logs = _train_bidirectional(
+            bidirectional_output_dir, max_epochs, probability_threshold, max_entities
         )
-        bidirectional_duration = time.time() - bidirectional_start_time
-        print(f"Bidirectional training completed in {bidirectional_duration:.1f}s ({len(bidirectional_logs)} epochs)")
-    except Exception as e:
-        print(f"Bidirectional training failed: {str(e)}")
-        bidirectional_duration = time.time() - bidirectional_start_time
-        bidirectional_logs = []
     
     # Step 3: Generate comparison plots
     print("\nSTEP 3: Generating Comparison Plots")
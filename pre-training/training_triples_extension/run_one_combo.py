@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Script to train and evaluate the extended model for a single hyperparameter combination.
+Launched by hyperparameter_search.py in a fresh process for every combination,
+so that GPU memory is returned to the system between runs.
+"""
+
+import os
+import argparse
+import json
+import torch
+
+import complex_extended_bidirectional as train_extended_model
+
+# Name of the file the metrics are written to inside the output directory
+METRICS_FILENAME = 'direct_metrics.json'
+
+def _to_python(value):
+    """Convert (possibly nested) tensor metrics to plain Python values."""
+    if isinstance(value, dict):
+        return {k: _to_python(v) for k, v in value.items()}
+    if torch.is_tensor(value):
+        return value.item()
+    return value
+
+def main():
+    """Parse command line arguments, train one combination and save its metrics."""
+    parser = argparse.ArgumentParser(description="Train the extended model for one hyperparameter combination")
+    parser.add_argument("--output-dir", type=str, required=True,
+                        help="Output directory for this combination")
+    parser.add_argument("--baseline-dir", type=str,
+                        help="Directory with baseline model")
+    parser.add_argument("--dataset", type=str, choices=["FB15k237", "CoDExSmall"],
+                        help="Dataset to use (default: from config)")
+    parser.add_argument("--model", type=str,
+                        help="Model type (default: from config)")
+    parser.add_argument("--embedding-dim", type=int,
+                        help="Embedding dimension (default: from config)")
+    parser.add_argument("--probability-threshold", type=float, required=True,
+                        help="Probability threshold for recommendations")
+    parser.add_argument("--max-recommendations", type=int, required=True,
+                        help="Maximum number of recommendations per entity")
+    parser.add_argument("--sampling-rate", type=float, required=True,
+                        help="Sampling rate for new triples")
+
+    args = parser.parse_args()
+
+    _, _, direct_metrics = train_extended_model.train_extended_model(
+        output_dir=args.output_dir,
+        baseline_model_dir=args.baseline_dir,
+        dataset_name=args.dataset,
+        model_type=args.model,
+        embedding_dim=args.embedding_dim,
+        probability_threshold=args.probability_threshold,
+        max_recommendations=args.max_recommendations,
+        sampling_rate=args.sampling_rate
+    )
+
+    # Move any tensor metrics to host once before serializing them
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    direct_metrics = _to_python(direct_metrics) if direct_metrics else {}
+
+    metrics_path = os.path.join(args.output_dir, METRICS_FILENAME)
+    with open(metrics_path, 'w') as f:
+        json.dump(direct_metrics, f, indent=2)
+    print(f"Saved metrics to {metrics_path}")
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,13 @@ It incorporates the I/O triples mechanism from complex_extended_bidirectional.
 import os
 import sys
 import json
+import hashlib
 import logging
 import pickle
 import requests
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Tuple, List, Optional, Any
 from collections import defaultdict
@@ -26,8 +29,8 @@ from pykeen.triples import TriplesFactory
 from pykeen.evaluation import RankBasedEvaluator
 
 # Import our custom modules
-from weighted_training_loop import WeightedSLCWATrainingLoop
-from leave_one_out_scoring import create_leave_one_out_scorer
+from weighted_training_loop import WeightedSLCWATrainingLoop, SharedNegativeSampler
+from leave_one_out_scoring import create_leave_one_out_scorer, create_pooled_session
 
 # Configure logging
 logging.basicConfig(
@@ -54,6 +57,7 @@ def get_config(key, default=None):
         'model.relation_regularize_weight': 8.266519211068944e-14,
         'api.url': 'http://localhost:8080/recommender',
         'api.timeout': 30,
+        'api.max_workers': 32,
         'probability_threshold': 0.25,
         'max_recommendations': 10,
         'max_new_triples': 100000,
@@ -73,24 +77,46 @@ def setup_wandb(config: Dict[str, Any]) -> None:
     )
 
 
-def get_entity_outgoing_properties(triples: torch.Tensor, entity_id: int, id_to_relation: Dict[int, str]) -> set:
+def build_relation_index(triples: torch.Tensor, entity_column: int) -> Dict[int, List[int]]:
+    """
+    Group the distinct relation ids of the triples by entity in a single pass.
+    
+    Args:
+        triples: Mapped triples tensor of shape (n, 3)
+        entity_column: Column of the entity to group by (0 = head, 2 = tail)
+        
+    Returns:
+        Dictionary mapping entity id to the sorted distinct relation ids of its triples
+    """
+    # Unique (entity, relation) pairs come back sorted by entity, then relation
+    pairs = np.unique(triples.cpu().numpy()[:, [entity_column, 1]], axis=0)
+    entities, starts = np.unique(pairs[:, 0], return_index=True)
+    return {
+        int(entity_id): relations.tolist()
+        for entity_id, relations in zip(entities, np.split(pairs[:, 1], starts[1:]))
+    }
+
+
+def get_entity_outgoing_properties(relations_by_head: Dict[int, List[int]], entity_id: int, outgoing_names: List[str]) -> set:
     """
     Get all outgoing properties (relations) where the entity is the head.
     """
-    head_triples = triples[triples[:, 0] == entity_id]
-    return {f"O:{id_to_relation[rel_id.item()]}" for rel_id in head_triples[:, 1]}
+    return {outgoing_names[rel_id] for rel_id in relations_by_head.get(entity_id, [])}
 
 
-def get_entity_incoming_properties(triples: torch.Tensor, entity_id: int, id_to_relation: Dict[int, str]) -> set:
+def get_entity_incoming_properties(relations_by_tail: Dict[int, List[int]], entity_id: int, incoming_names: List[str]) -> set:
     """
     Get all incoming properties (relations) where the entity is the tail.
     """
-    tail_triples = triples[triples[:, 2] == entity_id]
-    return {f"I:{id_to_relation[rel_id.item()]}" for rel_id in tail_triples[:, 1]}
+    return {incoming_names[rel_id] for rel_id in relations_by_tail.get(entity_id, [])}
 
 
-def get_recommendations(properties: List[str], api_url: str = None) -> List[Dict[str, Any]]:
-    """Get recommendations from the API."""
+def get_recommendations(
+    properties: List[str],
+    api_url: str = None,
+    session: requests.Session = None
+) -> Optional[List[Dict[str, Any]]]:
+    """Get recommendations from the API, reusing the session's connections if given (None if the request failed)."""
     api_url = api_url or get_config('api.url')
     timeout = get_config('api.timeout')
     
@@ -101,7 +127,8 @@ def get_recommendations(properties: List[str], api_url: str = None) -> List[Dict
     }
     
     try:
-        response = requests.post(
+        post = session.post if session is not None else requests.post
+        response = post(
             api_url,
             json=request_data,
             timeout=timeout,
@@ -116,7 +143,32 @@ def get_recommendations(properties: List[str], api_url: str = None) -> List[Dict
         
     except Exception as e:
         logger.warning(f"API request failed for properties {properties}: {e}")
-        return []
+        return None
+
+
+def get_recommendations_batch(
+    property_lists: List[List[str]],
+    api_url: str = None,
+    max_workers: int = None
+) -> List[Optional[List[Dict[str, Any]]]]:
+    """
+    Get recommendations for many property lists with concurrent API requests.
+    
+    Args:
+        property_lists: One property list per request
+        api_url: URL of the recommender API
+        max_workers: Maximum number of requests in flight
+        
+    Returns:
+        List of recommendation lists (None for failed requests), in the same order as property_lists
+    """
+    max_workers = max_workers or get_config('api.max_workers')
+    
+    # One pooled keep-alive session shared by all worker threads
+    session = create_pooled_session(max_workers)
+    
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda properties: get_recommendations(properties, api_url, session), property_lists))
 
 
 def process_recommendations(
@@ -135,52 +187,88 @@ def process_recommendations(
         logger.warning(f"WARNING: Unexpected recommendation format. Keys: {recommendations[0].keys()}")
     
     # Use the correct key 'property' instead of 'recommendation'
-    filtered = [
-        (rec["property"], rec["probability"])
-        for rec in recommendations
-        if rec["probability"] >= threshold
-    ]
+    properties = np.array([rec["property"] for rec in recommendations], dtype=object)
+    probabilities = np.fromiter(
+        (rec["probability"] for rec in recommendations), dtype=float, count=len(recommendations)
+    )
+    
+    # Keep recommendations above the threshold
+    mask = probabilities >= threshold
+    properties, probabilities = properties[mask], probabilities[mask]
     
-    logger.info(f"After threshold filtering: {len(filtered)} recommendations remain")
+    logger.info(f"After threshold filtering: {len(probabilities)} recommendations remain")
     
-    # Sort by probability in descending order
-    filtered.sort(key=lambda x: x[1], reverse=True)
+    # Sort by probability in descending order (stable, so ties keep the API order)
+    top = np.argsort(-probabilities, kind='stable')[:max_recommendations]
     
-    return filtered[:max_recommendations]
+    return list(zip(properties[top].tolist(), probabilities[top].tolist()))
+
+
+def load_recommendations_cache(filename: str) -> Dict[frozenset, List[Dict[str, Any]]]:
+    """Load cached API responses keyed by property set, or an empty cache if there is none."""
+    if filename is None or not os.path.exists(filename):
+        return {}
+    with open(filename, 'rb') as f:
+        rec_cache = pickle.load(f)
+    logger.info(f"Loaded {len(rec_cache)} cached recommendation responses from {filename}")
+    return rec_cache
+
+
+def save_recommendations_cache(rec_cache: Dict[frozenset, List[Dict[str, Any]]], filename: str) -> None:
+    """Save API responses keyed by property set to a pickle file."""
+    with open(filename, 'wb') as f:
+        pickle.dump(rec_cache, f)
+    logger.info(f"Saved {len(rec_cache)} recommendation responses to {filename}")
 
 
 def create_artificial_triples(
     dataset,
-    probability_threshold: float = None
-) -> Tuple[List[torch.Tensor], int]:
+    probability_threshold: float = None,
+    cache_filename: Optional[str] = None,
+    api_url: str = None
+) -> Tuple[torch.Tensor, int]:
     """
     Create artificial triples based on recommendations using both incoming and outgoing properties.
+    
+    API responses are cached by property set in cache_filename (if given), so reruns
+    on the same dataset only query property sets that were not seen before. The cache
+    only holds responses of one recommender, so name it after api_url.
     """
+    api_url = api_url or get_config('api.url')
     probability_threshold = probability_threshold or get_config('probability_threshold')
     max_new_triples = get_config('max_new_triples')
     
     logger.info("\n=== Creating Artificial Triples (Bidirectional) ===")
     
     # Get all unique entities
-    triples = dataset.training.mapped_triples
-    all_entities = set(triples[:, 0].tolist()).union(set(triples[:, 2].tolist()))
+    # Everything here is CPU work (indexing and HTTP), so keep the triples off the GPU
+    triples = dataset.training.mapped_triples.cpu()
+    all_entities = torch.unique(torch.cat([triples[:, 0], triples[:, 2]])).tolist()
     logger.info(f"Number of unique entities: {len(all_entities)}")
     
     # Create mappings
     id_to_relation = {v: k for k, v in dataset.relation_to_id.items()}
     relation_to_id = dataset.relation_to_id.copy()
     
-    # Set next entity ID
-    next_entity_id = max(dataset.entity_to_id.values()) + 1
+    # Set next entity ID (PyKEEN entity ids are contiguous, 0 .. num_entities - 1)
+    next_entity_id = dataset.training.num_entities
     logger.info(f"Initial next_entity_id: {next_entity_id}")
     
+    # Prefixed property names, indexed by relation id
+    outgoing_names = [f"O:{id_to_relation[rel_id]}" for rel_id in range(len(id_to_relation))]
+    incoming_names = [f"I:{id_to_relation[rel_id]}" for rel_id in range(len(id_to_relation))]
+    
+    # Group relations by head and by tail once instead of scanning the triples per entity
+    relations_by_head = build_relation_index(triples, 0)
+    relations_by_tail = build_relation_index(triples, 2)
+    
     # Group properties by entity
     entity_properties = defaultdict(dict)
     
     for entity_id in all_entities:
         # Get incoming and outgoing properties
-        incoming_props = get_entity_incoming_properties(triples, entity_id, id_to_relation)
-        outgoing_props = get_entity_outgoing_properties(triples, entity_id, id_to_relation)
+        incoming_props = get_entity_incoming_properties(relations_by_tail, entity_id, incoming_names)
+        outgoing_props = get_entity_outgoing_properties(relations_by_head, entity_id, outgoing_names)
         
         all_props = incoming_props.union(outgoing_props)
         if all_props:
@@ -192,8 +280,29 @@ def create_artificial_triples(
     
     logger.info(f"Entities with properties: {len(entity_properties)}")
     
-    # Get recommendations and create triples
-    new_triples = []
+    # Entities with the same property set get the same recommendations,
+    # so request each distinct set only once (concurrently)
+    distinct_property_sets = list(dict.fromkeys(
+        frozenset(prop_data['properties']) for prop_data in entity_properties.values()
+    ))
+    rec_cache = load_recommendations_cache(cache_filename)
+    missing_property_sets = [property_set for property_set in distinct_property_sets if property_set not in rec_cache]
+    logger.info(f"Distinct property sets: {len(distinct_property_sets)} "
+                f"(cache hits: {len(distinct_property_sets) - len(missing_property_sets)}, "
+                f"misses: {len(missing_property_sets)})")
+    if missing_property_sets:
+        responses = get_recommendations_batch([list(property_set) for property_set in missing_property_sets], api_url)
+        # Only successful responses are cached, so failed requests are retried on the next run
+        rec_cache.update(
+            (property_set, recommendations)
+            for property_set, recommendations in zip(missing_property_sets, responses)
+            if recommendations is not None
+        )
+        if cache_filename is not None:
+            save_recommendations_cache(rec_cache, cache_filename)
+    
+    # Columns of the new triples, turned into a single tensor at the end
+    heads, relations, tails = [], [], []
     triple_count = 0
     property_to_entity_id = {}
     
@@ -206,7 +315,9 @@ def create_artificial_triples(
             continue
         
         try:
-            recommendations = get_recommendations(properties)
+            recommendations = rec_cache.get(frozenset(properties))
+            if recommendations is None:
+                continue
             filtered_recommendations = process_recommendations(
                 recommendations, 
                 threshold=probability_threshold
@@ -240,39 +351,49 @@ def create_artificial_triples(
                 # Create new triple with proper directionality
                 if is_incoming:
                     # For incoming properties: property → relation → entity
-                    new_triple = torch.tensor([property_to_entity_id[prop_name], new_relation_id, entity_id])
+                    heads.append(property_to_entity_id[prop_name])
+                    tails.append(entity_id)
                 else:
                     # For outgoing properties: entity → relation → property
-                    new_triple = torch.tensor([entity_id, new_relation_id, property_to_entity_id[prop_name]])
-                
-                new_triples.append(new_triple)
+                    heads.append(entity_id)
+                    tails.append(property_to_entity_id[prop_name])
+                relations.append(new_relation_id)
                 triple_count += 1
                 
         except Exception as e:
             logger.warning(f"Failed to get recommendations for entity {entity_id}: {e}")
             continue
     
+    # Stack the columns as int64, so an empty result is still a (0, 3) long tensor
+    new_triples = torch.from_numpy(np.asarray([heads, relations, tails], dtype=np.int64).T.copy())
+    
     logger.info(f"Created {len(new_triples)} artificial triples")
     logger.info(f"Final next_entity_id: {next_entity_id}")
     
     return new_triples, next_entity_id
 
 
+def build_label_array(label_to_id: Dict[str, int]) -> np.ndarray:
+    """Invert a label-to-id mapping into an object array of labels indexed by id."""
+    labels = np.empty(len(label_to_id), dtype=object)
+    labels[list(label_to_id.values())] = list(label_to_id.keys())
+    return labels
+
+
 def convert_triples_to_string_format(triples_factory) -> List[Tuple[str, str, str]]:
     """Convert PyKEEN triples factory to string format for API calls."""
     logger.info("Converting triples to string format...")
     
-    string_triples = []
-    mapped_triples = triples_factory.mapped_triples
+    # Label arrays indexed by id, so whole columns can be translated at once
+    entity_labels = build_label_array(triples_factory.entity_to_id)
+    relation_labels = build_label_array(triples_factory.relation_to_id)
+    mapped_triples = triples_factory.mapped_triples.cpu().numpy()
     
-    for triple in mapped_triples:
-        head_id, relation_id, tail_id = triple.tolist()
-        
-        head_name = triples_factory.entity_id_to_label[head_id]
-        relation_name = triples_factory.relation_id_to_label[relation_id]
-        tail_name = triples_factory.entity_id_to_label[tail_id]
-        
-        string_triples.append((head_name, relation_name, tail_name))
+    string_triples = list(zip(
+        entity_labels[mapped_triples[:, 0]].tolist(),
+        relation_labels[mapped_triples[:, 1]].tolist(),
+        entity_labels[mapped_triples[:, 2]].tolist()
+    ))
     
     logger.info(f"Converted {len(string_triples)} triples to string format")
     return string_triples
@@ -281,61 +402,131 @@ def convert_triples_to_string_format(triples_factory) -> List[Tuple[str, str, st
 def convert_string_weights_to_id_weights(
     string_weights: Dict[Tuple[str, str, str], float],
     triples_factory
-) -> Dict[Tuple[int, int, int], float]:
-    """Convert string-based triple weights to ID-based weights for PyKEEN."""
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Convert string-based triple weights to ID-based weights for PyKEEN.
+    
+    Returns:
+        Tuple of a (n, 3) tensor of ID triples and a (n,) tensor of their weights
+    """
     logger.info("Converting string weights to ID weights...")
     
-    id_weights = {}
-    conversion_errors = 0
+    keys = list(string_weights.keys())
+    entity_to_id = triples_factory.entity_to_id
+    relation_to_id = triples_factory.relation_to_id
     
-    for (head_name, relation_name, tail_name), weight in string_weights.items():
-        try:
-            head_id = triples_factory.entity_to_id[head_name]
-            relation_id = triples_factory.relation_to_id[relation_name]
-            tail_id = triples_factory.entity_to_id[tail_name]
-            
-            id_weights[(head_id, relation_id, tail_id)] = weight
-            
-        except KeyError as e:
-            conversion_errors += 1
-            if conversion_errors <= 10:  # Log first 10 errors
-                logger.warning(f"Failed to convert triple ({head_name}, {relation_name}, {tail_name}): {e}")
+    # Look up each column in one pass, marking unknown labels with -1
+    head_ids = np.fromiter((entity_to_id.get(head, -1) for head, _, _ in keys), dtype=np.int64, count=len(keys))
+    relation_ids = np.fromiter((relation_to_id.get(rel, -1) for _, rel, _ in keys), dtype=np.int64, count=len(keys))
+    tail_ids = np.fromiter((entity_to_id.get(tail, -1) for _, _, tail in keys), dtype=np.int64, count=len(keys))
+    weights = np.fromiter(string_weights.values(), dtype=np.float64, count=len(keys))
     
+    valid = (head_ids >= 0) & (relation_ids >= 0) & (tail_ids >= 0)
+    id_triples = torch.from_numpy(np.stack([head_ids[valid], relation_ids[valid], tail_ids[valid]], axis=1))
+    id_weights = torch.from_numpy(weights[valid].astype(np.float32))
+    
+    conversion_errors = int((~valid).sum())
     if conversion_errors > 0:
+        # Log first 10 errors
+        for index in np.flatnonzero(~valid)[:10]:
+            logger.warning(f"Failed to convert triple {keys[index]}: unknown entity or relation label")
         logger.warning(f"Failed to convert {conversion_errors} triples to ID format")
     
     logger.info(f"Converted {len(id_weights)} string weights to ID weights")
-    return id_weights
+    return id_triples, id_weights
 
 
-def save_weights_to_file(weights: Dict, filename: str) -> None:
-    """Save weights dictionary to a pickle file."""
-    with open(filename, 'wb') as f:
-        pickle.dump(weights, f)
+def save_weights_to_file(triples: torch.Tensor, weights: torch.Tensor, filename: str) -> None:
+    """Save triple weights as a (n, 3) triples tensor and a parallel (n,) weights tensor."""
+    torch.save({'triples': triples, 'weights': weights}, filename)
     logger.info(f"Saved weights to {filename}")
 
 
-def load_weights_from_file(filename: str) -> Dict:
-    """Load weights dictionary from a pickle file."""
-    with open(filename, 'rb') as f:
-        weights = pickle.load(f)
+def load_weights_from_file(filename: str) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Load the triples and weights tensors saved by save_weights_to_file."""
+    # Memory-map the tensor storages instead of reading them into a buffer and copying
+    data = torch.load(filename, mmap=True, weights_only=True)
     logger.info(f"Loaded weights from {filename}")
-    return weights
+    return data['triples'], data['weights']
+
+
+def migrate_legacy_weights(
+    triples_factory,
+    config: Dict[str, Any],
+    weights_filename: str
+) -> Optional[Tuple[torch.Tensor, torch.Tensor]]:
+    """
+    Convert weights pickled by earlier runs ({(h, r, t): weight} in
+    triple_weights_{dataset}_averaged.pkl) to the tensor format under weights_filename.
+    
+    Returns:
+        The migrated (triples, weights) tensors, or None if there is no legacy file
+        or it was not computed for exactly these training triples
+    """
+    legacy_filename = f"triple_weights_{config['dataset']}_averaged.pkl"
+    if not os.path.exists(legacy_filename):
+        return None
+    
+    with open(legacy_filename, 'rb') as f:
+        legacy_weights = pickle.load(f)
+    
+    # The legacy name carries no content hash, so check the triples themselves
+    training_triples = set(map(tuple, triples_factory.mapped_triples.cpu().tolist()))
+    if set(legacy_weights.keys()) != training_triples:
+        logger.warning(f"{legacy_filename} does not match the training triples; recomputing the weights")
+        return None
+    
+    id_triples = torch.tensor(list(legacy_weights.keys()), dtype=torch.long)
+    id_weights = torch.tensor(list(legacy_weights.values()), dtype=torch.float32)
+    logger.info(f"Migrating {len(id_weights)} weights from {legacy_filename}")
+    save_weights_to_file(id_triples, id_weights, weights_filename)
+    return id_triples, id_weights
+
+
+def get_api_cache_tag(api_url: str) -> str:
+    """Short digest of the API URL, used to keep cached responses of different recommenders apart."""
+    return hashlib.blake2b(api_url.encode(), digest_size=4).hexdigest()
+
+
+def get_weights_filename(triples_factory, config: Dict[str, Any]) -> str:
+    """
+    Name the weights cache after the content it was computed from.
+    
+    The key hashes the training triples, the scoring settings and the API URL, so extending
+    the training set (e.g. with artificial triples) or switching recommenders never
+    silently reuses stale weights.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(triples_factory.mapped_triples.cpu().numpy().tobytes())
+    digest.update(repr(config.get("max_entities_to_score", None)).encode())
+    digest.update(config["api_url"].encode())
+    return f"triple_weights_{config['dataset']}_{digest.hexdigest()}.pt"
 
 
 def compute_and_save_triple_weights(
     triples_factory,
     config: Dict[str, Any],
     force_recompute: bool = False
-) -> Dict[Tuple[int, int, int], float]:
-    """Compute or load triple weights using Leave-One-Out scoring."""
-    weights_filename = f"triple_weights_{config['dataset']}_averaged.pkl"
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Compute or load triple weights using Leave-One-Out scoring.
+    
+    Returns:
+        Tuple of a (n, 3) tensor of ID triples and a (n,) tensor of their weights
+    """
+    weights_filename = get_weights_filename(triples_factory, config)
     
     # Check if weights file exists and we're not forcing recomputation
     if os.path.exists(weights_filename) and not force_recompute:
         logger.info(f"Loading existing weights from {weights_filename}")
         return load_weights_from_file(weights_filename)
     
+    # Reuse the weights of runs that predate the tensor format instead of rescoring
+    if not force_recompute:
+        migrated = migrate_legacy_weights(triples_factory, config, weights_filename)
+        if migrated is not None:
+            return migrated
+    
     logger.info("Computing triple weights using Leave-One-Out scoring...")
     
     # Convert triples to string format
@@ -346,15 +537,19 @@ def compute_and_save_triple_weights(
         api_url=config["api_url"],
         max_retries=config.get("api_max_retries", 3),
         retry_delay=config.get("api_retry_delay", 1.0),
-        timeout=config.get("api_timeout", 30.0)
+        timeout=config.get("api_timeout", 30.0),
+        max_workers=config.get("api_max_workers", 32),
+        cache_path=f"loo_api_cache_{config['dataset']}_{get_api_cache_tag(config['api_url'])}.sqlite",
+        memory_cache_size=config.get("api_memory_cache_size", None)
     )
     
     # Score all triples with averaging
-    string_weights = scorer.score_all_triples(
-        triples=string_triples,
-        max_entities_to_score=config.get("max_entities_to_score", None),
-        use_averaging=True
-    )
+    with scorer:
+        string_weights = scorer.score_all_triples(
+            triples=string_triples,
+            max_entities_to_score=config.get("max_entities_to_score", None),
+            use_averaging=True
+        )
     
     # Log scoring statistics
     scores = list(string_weights.values())
@@ -362,12 +557,12 @@ def compute_and_save_triple_weights(
                 f"mean={sum(scores)/len(scores):.4f}")
     
     # Convert to ID-based weights
-    id_weights = convert_string_weights_to_id_weights(string_weights, triples_factory)
+    id_triples, id_weights = convert_string_weights_to_id_weights(string_weights, triples_factory)
     
     # Save weights for future use
-    save_weights_to_file(id_weights, weights_filename)
+    save_weights_to_file(id_triples, id_weights, weights_filename)
     
-    return id_weights
+    return id_triples, id_weights
 
 
 def train_weighted_complex_pipeline(config: Dict[str, Any]) -> Dict[str, Any]:
@@ -393,10 +588,12 @@ def train_weighted_complex_pipeline(config: Dict[str, Any]) -> Dict[str, Any]:
         logger.info("Creating artificial triples using I/O mechanism...")
         new_triples, next_entity_id = create_artificial_triples(
             dataset,
-            probability_threshold=config.get("probability_threshold", 0.25)
+            probability_threshold=config.get("probability_threshold", 0.25),
+            cache_filename=f"recommendations_cache_{config['dataset']}_{get_api_cache_tag(config['api_url'])}.pkl",
+            api_url=config["api_url"]
         )
         
-        if new_triples:
+        if len(new_triples) > 0:
             # Create extended entity mappings
             extended_entity_to_id = dataset.entity_to_id.copy()
             extended_relation_to_id = dataset.relation_to_id.copy()
@@ -406,7 +603,7 @@ def train_weighted_complex_pipeline(config: Dict[str, Any]) -> Dict[str, Any]:
                 extended_entity_to_id[f"NEW_{i}"] = i
             
             # Combine datasets
-            sampled_triples = torch.stack(new_triples)
+            sampled_triples = new_triples
             combined_triples = torch.cat([
                 dataset.training.mapped_triples,
                 sampled_triples
@@ -429,7 +626,7 @@ def train_weighted_complex_pipeline(config: Dict[str, Any]) -> Dict[str, Any]:
         training_factory = dataset.training
     
     # Compute triple weights
-    triple_weights = compute_and_save_triple_weights(
+    weighted_triples, triple_weights = compute_and_save_triple_weights(
         training_factory, 
         config,
         force_recompute=config.get("force_recompute_weights", False)
@@ -453,6 +650,8 @@ def train_weighted_complex_pipeline(config: Dict[str, Any]) -> Dict[str, Any]:
         'batch_size': config["batch_size"],
         'use_tqdm': True,
         'use_tqdm_batch': True,
+        'num_workers': config.get("num_workers", 0),  # Build batches in worker processes
+        'drop_last': True,  # Equal-sized batches (also avoids recompiling for a short last batch)
     }
     
     optimizer_kwargs = {'lr': config["learning_rate"]}
@@ -471,6 +670,18 @@ def train_weighted_complex_pipeline(config: Dict[str, Any]) -> Dict[str, Any]:
         'relative_delta': 0.0001
     }
     
+    # Reduced precision is opt-in: TF32 tensor-core matmuls and/or autocast in the training loop
+    autocast_dtype = None
+    if torch.cuda.is_available():
+        if config.get("tf32", False):
+            torch.set_float32_matmul_precision('high')
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+            logger.info("Using TF32 matmuls")
+        if config.get("autocast_dtype"):
+            autocast_dtype = getattr(torch, config["autocast_dtype"])
+            logger.info(f"Using {config['autocast_dtype']} autocast for training")
+    
     # Train using PyKEEN pipeline with weighted training loop
     logger.info("Starting training with PyKEEN pipeline...")
     training_start_time = datetime.now()
@@ -484,15 +695,18 @@ def train_weighted_complex_pipeline(config: Dict[str, Any]) -> Dict[str, Any]:
         model_kwargs=model_kwargs,
         training_loop=WeightedSLCWATrainingLoop,
         training_loop_kwargs={
+            'weighted_triples': weighted_triples,
             'triple_weights': triple_weights,
             'weight_scale': config["weight_scale"],
+            'autocast_dtype': autocast_dtype,
+            'compile_interaction': config.get("compile", False),
         },
         training_kwargs=training_kwargs,
         optimizer='Adam',
         optimizer_kwargs=optimizer_kwargs,
         lr_scheduler='ExponentialLR',
         lr_scheduler_kwargs=lr_scheduler_kwargs,
-        negative_sampler='basic',
+        negative_sampler=SharedNegativeSampler if config.get("negative_sampler") == "shared" else 'basic',
         evaluation_kwargs=evaluation_kwargs,
         random_seed=config.get("random_seed", 42),
         stopper='early',
@@ -536,8 +750,16 @@ def train_weighted_complex_pipeline(config: Dict[str, Any]) -> Dict[str, Any]:
     # Save model if requested
     if config.get("save_model", False):
         model_filename = f"complex_weighted_pipeline_model_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pt"
-        torch.save(result.model, model_filename)
-        logger.info(f"Saved model to {model_filename}")
+        # Copy the weights to the CPU now (a consistent snapshot) and only write them in the background;
+        # the thread is not a daemon, so the interpreter waits for the write before exiting
+        checkpoint = {
+            'state_dict': {k: v.detach().cpu().clone() for k, v in result.model.state_dict().items()},
+            'entity_to_id': training_factory.entity_to_id,
+            'relation_to_id': training_factory.relation_to_id,
+            'config': config,
+        }
+        threading.Thread(target=torch.save, args=(checkpoint, model_filename)).start()
+        logger.info(f"Saving model to {model_filename} in the background")
     
     return final_metrics
 
@@ -561,8 +783,13 @@ def main():
         "embedding_dim": 1000,  
         "epochs": 1,          
         "batch_size": 1000,    
+        "num_workers": 0,  # Batches built in the main process; raise to use DataLoader worker processes
         "learning_rate": 0.1,  
         "regularize_weight": 0.05,  
+        "autocast_dtype": None,  # FP32 by default; "bfloat16" opts into mixed precision on CUDA
+        "tf32": False,  # Set True to allow TF32 tensor-core matmuls on CUDA (Ampere+)
+        "compile": False,  # Set True to torch.compile the ComplEx interaction (PyTorch 2.x, adds warm-up time)
+        "negative_sampler": "basic",  # "basic" (independent per triple) or "shared" (one draw per batch, opt-in)
         
         # Evaluation configuration
         "eval_batch_size": 256,
@@ -583,6 +810,8 @@ def main():
         "api_max_retries": 3,
         "api_retry_delay": 1.0,
         "api_timeout": 30.0,
+        "api_max_workers": 32,
+        "api_memory_cache_size": 100000,  # API responses kept in memory (all are also cached on disk)
         
         # Logging and saving
         "use_wandb": True,
@@ -5,12 +5,17 @@ This module implements Leave-One-Out scoring where for each triple
 we compute query scores from both the head and tail entity perspectives and average them.
 """
 
+import hashlib
 import json
 import logging
 import requests
+import sqlite3
+import sys
+import threading
 import time
-from typing import Dict, List, Tuple, Set, Optional, Any
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Tuple, Set, Optional, Any
+from collections import defaultdict, OrderedDict
 
 
 # Configure logging
@@ -18,6 +23,26 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def create_pooled_session(max_workers: int) -> requests.Session:
+    """
+    Create a keep-alive session whose connection pool holds one connection per worker thread.
+    
+    Shared by every concurrent recommender API client in this directory, so the pool and
+    retry settings are defined in one place. Retries are left to the callers.
+    
+    Args:
+        max_workers: Maximum number of requests in flight at once
+        
+    Returns:
+        Configured requests.Session (close it, or use it as a context manager)
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
 class LeaveOneOutScorer:
     """
     Computes Leave-One-Out scores for knowledge graph triples using a recommender API.
@@ -33,7 +58,10 @@ class LeaveOneOutScorer:
         api_url: str = "http://localhost:8080/recommender",
         max_retries: int = 3,
         retry_delay: float = 1.0,
-        timeout: float = 30.0
+        timeout: float = 30.0,
+        max_workers: int = 32,
+        cache_path: Optional[str] = None,
+        memory_cache_size: Optional[int] = None
     ):
         """
         Initialize the Leave-One-Out scorer.
@@ -43,15 +71,85 @@ class LeaveOneOutScorer:
             max_retries: Maximum number of API call retries
             retry_delay: Delay between retries in seconds
             timeout: API call timeout in seconds
+            max_workers: Maximum number of API requests in flight at once
+            cache_path: SQLite file persisting API responses across runs (None to keep them in memory only)
+            memory_cache_size: Maximum number of API responses kept in memory (None for no limit)
         """
         self.api_url = api_url
         self.max_retries = max_retries
         self.retry_delay = retry_delay
         self.timeout = timeout
+        self.max_workers = max_workers
+        
+        # One keep-alive session for all API calls, with a connection per worker thread
+        # (retries are handled in _call_recommender_api)
+        self._session = create_pooled_session(max_workers)
         
         # Cache for entity properties and API responses
         self.entity_properties_cache: Dict[str, Set[str]] = {}
-        self.api_response_cache: Dict[str, Dict[str, float]] = {}
+        # API responses: in-memory LRU in front of the optional on-disk store
+        self.api_response_cache: "OrderedDict[FrozenSet[str], Dict[str, float]]" = OrderedDict()
+        self.memory_cache_size = memory_cache_size
+        self._cache_lock = threading.Lock()
+        self._disk_cache = None
+        if cache_path is not None:
+            self._disk_cache = sqlite3.connect(cache_path, check_same_thread=False)
+            self._disk_cache.execute("PRAGMA journal_mode=WAL")
+            self._disk_cache.execute("PRAGMA synchronous=NORMAL")
+            self._disk_cache.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)")
+            self._disk_cache.commit()
+        
+        # Per-entity sorted properties with each property's position, from which the
+        # leave-one-out property tuples are sliced on demand
+        self._entity_properties_sorted: Dict[str, Tuple[str, ...]] = {}
+        self._entity_property_index: Dict[str, Dict[str, int]] = {}
+    
+    def _disk_cache_key(self, cache_key: FrozenSet[str]) -> str:
+        """Stable (run-independent) key of a property set for the on-disk cache.
+        
+        The API URL is part of the key, so responses of a different recommender
+        sharing the same file are never returned.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.api_url.encode())
+        digest.update(b"\n")
+        digest.update(",".join(sorted(cache_key)).encode())
+        return digest.hexdigest()
+    
+    def _remember_response(self, cache_key: FrozenSet[str], property_scores: Dict[str, float]) -> None:
+        """Put a response in the in-memory cache, evicting the least recently used one if full."""
+        self.api_response_cache[cache_key] = property_scores
+        self.api_response_cache.move_to_end(cache_key)
+        if self.memory_cache_size is not None and len(self.api_response_cache) > self.memory_cache_size:
+            self.api_response_cache.popitem(last=False)
+    
+    def _get_cached_response(self, cache_key: FrozenSet[str]) -> Optional[Dict[str, float]]:
+        """Look a response up in memory, then on disk; None if it was never cached."""
+        with self._cache_lock:
+            if cache_key in self.api_response_cache:
+                self.api_response_cache.move_to_end(cache_key)
+                return self.api_response_cache[cache_key]
+            if self._disk_cache is None:
+                return None
+            row = self._disk_cache.execute(
+                "SELECT response FROM responses WHERE key = ?", (self._disk_cache_key(cache_key),)
+            ).fetchone()
+            if row is None:
+                return None
+            property_scores = json.loads(row[0])
+            self._remember_response(cache_key, property_scores)
+            return property_scores
+    
+    def _cache_response(self, cache_key: FrozenSet[str], property_scores: Dict[str, float]) -> None:
+        """Store a successful response in memory and, if enabled, on disk."""
+        with self._cache_lock:
+            self._remember_response(cache_key, property_scores)
+            if self._disk_cache is not None:
+                self._disk_cache.execute(
+                    "INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)",
+                    (self._disk_cache_key(cache_key), json.dumps(property_scores))
+                )
+                self._disk_cache.commit()
     
     def _call_recommender_api(self, properties: List[str]) -> Optional[Dict[str, float]]:
         """
@@ -63,10 +161,11 @@ class LeaveOneOutScorer:
         Returns:
             Dictionary mapping recommended properties to their probabilities, or None if failed
         """
-        # Create cache key
-        cache_key = json.dumps(sorted(properties))
-        if cache_key in self.api_response_cache:
-            return self.api_response_cache[cache_key]
+        # Create cache key (the API response does not depend on the property order)
+        cache_key = frozenset(properties)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
         
         for attempt in range(self.max_retries):
             try:
@@ -76,7 +175,7 @@ class LeaveOneOutScorer:
                     "types": []
                 }
                 
-                response = requests.post(
+                response = self._session.post(
                     self.api_url,
                     json=request_data,
                     timeout=self.timeout
@@ -95,7 +194,7 @@ class LeaveOneOutScorer:
                                 property_scores[rec["property"]] = rec["probability"]
                         
                         # Cache the result
-                        self.api_response_cache[cache_key] = property_scores
+                        self._cache_response(cache_key, property_scores)
                         return property_scores
                     else:
                         logger.warning(f"API response missing 'recommendations' field")
@@ -111,6 +210,41 @@ class LeaveOneOutScorer:
         logger.error(f"Failed to get API response after {self.max_retries} attempts")
         return None
     
+    def prefetch_recommendations(self, property_lists: Iterable[Sequence[str]]) -> None:
+        """
+        Query the API for many property lists concurrently, filling the response cache.
+        
+        The scoring methods then find every response in the cache, so the serial
+        scoring loop no longer waits on one round-trip at a time.
+        
+        Args:
+            property_lists: Property lists to query (duplicates and cached lists are skipped)
+        """
+        pending = {}
+        for properties in property_lists:
+            cache_key = frozenset(properties)
+            if cache_key not in pending and self._get_cached_response(cache_key) is None:
+                pending[cache_key] = properties
+        
+        if not pending:
+            return
+        
+        logger.info(f"Prefetching {len(pending)} API responses with {self.max_workers} workers...")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Results land in api_response_cache; exhaust the iterator to wait for all calls
+            for _ in executor.map(self._call_recommender_api, pending.values()):
+                pass
+    
+    def _leave_one_out_properties(self, entity: str, removed_property: str) -> Tuple[str, ...]:
+        """Get an entity's properties without the given one (empty if the entity is unknown)."""
+        # Built on the fly: slicing is cheap, and memoizing one tuple per (entity, property)
+        # pair would keep hundreds of thousands of them alive for the whole run
+        properties = self._entity_properties_sorted.get(entity, ())
+        index = self._entity_property_index.get(entity, {}).get(removed_property)
+        if index is not None:
+            properties = properties[:index] + properties[index + 1:]
+        return properties
+    
     def build_entity_properties_map(
         self,
         triples: List[Tuple[str, str, str]]
@@ -126,17 +260,30 @@ class LeaveOneOutScorer:
         """
         logger.info("Building entity properties map...")
         entity_properties = defaultdict(set)
+        # One interned string per distinct property, shared by all entities that have it
+        outgoing_properties = {}
+        incoming_properties = {}
         
         for head, relation, tail in triples:
+            if relation not in outgoing_properties:
+                outgoing_properties[relation] = sys.intern(f"O:{relation}")
+                incoming_properties[relation] = sys.intern(f"I:{relation}")
             # Add outgoing property for head entity
-            entity_properties[head].add(f"O:{relation}")
+            entity_properties[head].add(outgoing_properties[relation])
             # Add incoming property for tail entity  
-            entity_properties[tail].add(f"I:{relation}")
+            entity_properties[tail].add(incoming_properties[relation])
         
         # Convert to regular dict with frozen sets
         self.entity_properties_cache = {
             entity: set(props) for entity, props in entity_properties.items()
         }
+        self._entity_properties_sorted = {
+            entity: tuple(sorted(props)) for entity, props in self.entity_properties_cache.items()
+        }
+        self._entity_property_index = {
+            entity: {prop: index for index, prop in enumerate(props)}
+            for entity, props in self._entity_properties_sorted.items()
+        }
         
         logger.info(f"Built properties map for {len(self.entity_properties_cache)} entities")
         return self.entity_properties_cache
@@ -164,19 +311,15 @@ class LeaveOneOutScorer:
         if head not in self.entity_properties_cache:
             return 0.05  # Default score for unknown entities
 
-        # Get all properties of the head entity
-        head_properties = self.entity_properties_cache[head].copy()
-        
-        # Remove the OUTGOING version of the target relation (leave-one-out)
-        target_property = f"O:{relation}"
-        if target_property in head_properties:
-            head_properties.remove(target_property)
+        # Get all properties of the head entity, without the OUTGOING version
+        # of the target relation (leave-one-out)
+        target_property = sys.intern(f"O:{relation}")
+        properties_list = self._leave_one_out_properties(head, target_property)
 
-        if not head_properties:
+        if not properties_list:
             return 0.05  # No properties left to query with
 
         # Query the recommender API with remaining properties
-        properties_list = list(head_properties)
         recommendations = self._call_recommender_api(properties_list)
 
         if recommendations is None:
@@ -209,19 +352,15 @@ class LeaveOneOutScorer:
         if tail not in self.entity_properties_cache:
             return 0.05  # Default score for unknown entities
         
-        # Get all properties of the tail entity
-        tail_properties = self.entity_properties_cache[tail].copy()
-        
-        # Remove the INCOMING version of the target relation (leave-one-out)
-        incoming_property = f"I:{relation}"
-        if incoming_property in tail_properties:
-            tail_properties.remove(incoming_property)
+        # Get all properties of the tail entity, without the INCOMING version
+        # of the target relation (leave-one-out)
+        incoming_property = sys.intern(f"I:{relation}")
+        properties_list = self._leave_one_out_properties(tail, incoming_property)
         
-        if not tail_properties:
+        if not properties_list:
             return 0.05  # No properties left to query with
         
         # Query the recommender API with remaining properties
-        properties_list = list(tail_properties)
         recommendations = self._call_recommender_api(properties_list)
         
         if recommendations is None:
@@ -292,6 +431,20 @@ class LeaveOneOutScorer:
         if max_entities_to_score is not None:
             entities_to_score = entities_to_score[:max_entities_to_score]
             logger.info(f"Limiting scoring to {len(entities_to_score)} entities")
+        # Set for O(1) membership checks in the per-triple loop below
+        entities_to_score = set(entities_to_score)
+        
+        # Issue all API queries the scoring loop will need concurrently up front; the
+        # leave-one-out lists are generated lazily and only the distinct ones are kept
+        def iter_property_lists():
+            for head, relation, tail in triples:
+                if max_entities_to_score is not None:
+                    if head not in entities_to_score and tail not in entities_to_score:
+                        continue
+                yield self._leave_one_out_properties(head, f"O:{relation}")
+                if use_averaging:
+                    yield self._leave_one_out_properties(tail, f"I:{relation}")
+        self.prefetch_recommendations(properties for properties in iter_property_lists() if properties)
         
         # Score triples
         triple_scores = {}
@@ -320,12 +473,29 @@ class LeaveOneOutScorer:
         logger.info(f"Completed scoring {scored_count} triples")
         return triple_scores
     
+    def close(self) -> None:
+        """Close the pooled HTTP connections and the on-disk cache."""
+        self._session.close()
+        if self._disk_cache is not None:
+            self._disk_cache.close()
+            self._disk_cache = None
+    
+    def __enter__(self) -> "LeaveOneOutScorer":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
     def get_cache_stats(self) -> Dict[str, int]:
         """Get statistics about cached data."""
-        return {
+        stats = {
             "entity_properties_cached": len(self.entity_properties_cache),
             "api_responses_cached": len(self.api_response_cache)
         }
+        if self._disk_cache is not None:
+            with self._cache_lock:
+                stats["api_responses_on_disk"] = self._disk_cache.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return stats
 
 
 def create_leave_one_out_scorer(
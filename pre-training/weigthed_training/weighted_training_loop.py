@@ -7,7 +7,8 @@ during training based on recommender system query scores.
 
 import torch
 import torch.nn as nn
-from typing import Dict, Tuple, Optional, Any
+from typing import Dict, Optional, Any
+from pykeen.sampling import NegativeSampler
 from pykeen.training import SLCWATrainingLoop
 from pykeen.typing import MappedTriples
 
@@ -22,21 +23,43 @@ class WeightedSLCWATrainingLoop(SLCWATrainingLoop):
     
     def __init__(
         self,
-        triple_weights: Dict[Tuple[int, int, int], float],
+        weighted_triples: torch.LongTensor,
+        triple_weights: torch.FloatTensor,
         weight_scale: float = 5.0,
+        autocast_dtype: Optional[torch.dtype] = None,
+        compile_interaction: bool = False,
         **kwargs
     ):
         """
         Initialize the weighted training loop.
         
         Args:
-            triple_weights: Dictionary mapping (head_id, relation_id, tail_id) to weight
+            weighted_triples: Tensor of shape (n, 3) with the (head_id, relation_id, tail_id) triples that have a weight
+            triple_weights: Tensor of shape (n,) with the weight of each triple in weighted_triples
             weight_scale: Scale factor to amplify weight differences
+            autocast_dtype: Run the forward pass under CUDA autocast with this dtype (None = full FP32)
+            compile_interaction: Compile the model's interaction function with torch.compile while training
             **kwargs: Additional arguments passed to parent SLCWATrainingLoop
         """
         super().__init__(**kwargs)
-        self.triple_weights = triple_weights
         self.weight_scale = weight_scale
+        self.autocast_dtype = autocast_dtype
+        self.compile_interaction = compile_interaction
+        
+        # Sorted single-integer triple keys, so a batch is looked up with one searchsorted,
+        # kept on the model's device so the lookup is a pure on-device gather
+        device = next(self.model.parameters()).device
+        keys = self._triple_keys(weighted_triples.to(device).long())
+        self.weight_keys, order = torch.sort(keys)
+        # Apply scaling: weight_scale * base_weight
+        # (bf16 is plenty for weights of roughly 0.05-5 and halves the table; cast to the loss dtype when applied)
+        self.scaled_weights = (self.weight_scale * triple_weights.to(device).float()[order]).to(torch.bfloat16)
+    
+    def _triple_keys(self, triples: torch.LongTensor) -> torch.LongTensor:
+        """Encode (head, relation, tail) triples as unique int64 keys."""
+        num_entities = self.model.num_entities
+        num_relations = self.model.num_relations
+        return (triples[:, 0] * num_relations + triples[:, 1]) * num_entities + triples[:, 2]
     
     def _get_batch_weights(self, positive_batch: torch.Tensor) -> torch.Tensor:
         """
@@ -48,26 +71,39 @@ class WeightedSLCWATrainingLoop(SLCWATrainingLoop):
         Returns:
             Tensor of shape (batch_size,) with weights for each triple
         """
-        batch_size = positive_batch.shape[0]
-        # Get device dynamically from the model
-        device = next(self.model.parameters()).device
-        weights = torch.ones(batch_size, device=device)
+        device = self.weight_keys.device
+        if len(self.weight_keys) == 0:
+            return torch.ones(positive_batch.shape[0], device=device)
         
-        # Apply weights for each triple in the batch
-        for i, triple in enumerate(positive_batch):
-            head_id, relation_id, tail_id = tuple(triple.cpu().numpy())
-            triple_key = (int(head_id), int(relation_id), int(tail_id))
-            
-            if triple_key in self.triple_weights:
-                base_weight = self.triple_weights[triple_key]
-                # Apply scaling: weight_scale * base_weight
-                scaled_weight = self.weight_scale * base_weight
-                weights[i] = scaled_weight
-            else:
-                # Default weight for triples not in our weight dictionary
-                weights[i] = 1.0
+        # SLCWA batches keep their positives on the CPU, so this is one small
+        # (batch_size, 3) host-to-device copy per batch; the lookup itself runs on the device
+        batch_keys = self._triple_keys(positive_batch.to(device, non_blocking=True).long())
+        positions = torch.searchsorted(self.weight_keys, batch_keys).clamp_(max=len(self.weight_keys) - 1)
+        found = self.weight_keys[positions] == batch_keys
+        
+        weights = self.scaled_weights[positions]
+        # Default weight for triples not in our weights
+        return torch.where(found, weights, torch.ones_like(weights))
+    
+    def train(self, *args, **kwargs):
+        """
+        Train the model, with the interaction compiled if requested.
+        
+        The ComplEx interaction is a chain of elementwise products and a sum, which
+        torch.compile fuses into a single kernel. The original function is restored
+        afterwards so the trained model can still be pickled with torch.save.
+        """
+        if not self.compile_interaction:
+            return super().train(*args, **kwargs)
         
-        return weights
+        interaction = self.model.interaction
+        original_forward = interaction.forward
+        # dynamic=True avoids recompiling for the smaller last batch and evaluation batches
+        interaction.forward = torch.compile(original_forward, dynamic=True)
+        try:
+            return super().train(*args, **kwargs)
+        finally:
+            interaction.forward = original_forward
     
     def _process_batch(
         self,
@@ -83,36 +119,34 @@ class WeightedSLCWATrainingLoop(SLCWATrainingLoop):
         This overrides the parent method to apply triple-specific weights.
         """
         # First call the parent method to get the standard loss
-        loss = super()._process_batch(
-            batch, start, stop, label_smoothing, slice_size
-        )
+        # (parameters and optimizer state stay FP32; only the computation is autocast)
+        if self.autocast_dtype is not None:
+            with torch.autocast('cuda', dtype=self.autocast_dtype):
+                loss = super()._process_batch(
+                    batch, start, stop, label_smoothing, slice_size
+                )
+            loss = loss.float()
+        else:
+            loss = super()._process_batch(
+                batch, start, stop, label_smoothing, slice_size
+            )
         
         # Get the batch slice for weight calculation
-        # MappedTriples is a tensor, so we can index it directly with integers
         try:
-            # Create indices to access the batch slice
-            end_idx = min(stop, len(batch))
-            batch_indices = list(range(start, end_idx))
-            
-            # Get the actual triples for this batch slice
-            if len(batch_indices) > 0:
-                batch_slice = batch[batch_indices]  # Use integer list indexing instead of slice
-            else:
-                # Empty batch case
-                device = next(self.model.parameters()).device
-                batch_weights = torch.ones(0, device=device)
-                return loss
-                
-        except (IndexError, AttributeError, TypeError) as e:
-            # Fallback: create default weights if we can't process the batch
-            batch_size = stop - start
-            device = next(self.model.parameters()).device
-            batch_weights = torch.ones(batch_size, device=device)
-            mean_weight = batch_weights.mean()
-            return loss * mean_weight
+            # SLCWA batches may come as (positives, negatives, masks); weights belong to the positives
+            positive_batch = batch[0] if isinstance(batch, tuple) else batch
+            # Slicing returns a view on the CPU-side positives, no index list or copy
+            batch_slice = positive_batch[start:stop]
+        except (IndexError, AttributeError, TypeError):
+            # Fallback: default weight of 1.0 if we can't process the batch
+            return loss
         
-        # Get weights for this batch
-        batch_weights = self._get_batch_weights(batch_slice)
+        if len(batch_slice) == 0:
+            # Empty batch case
+            return loss
+        
+        # Get weights for this batch, in the dtype of the loss they scale
+        batch_weights = self._get_batch_weights(batch_slice).to(loss.dtype)
         
         # Apply weights to the loss
         if loss.dim() > 0:
@@ -131,10 +165,49 @@ class WeightedSLCWATrainingLoop(SLCWATrainingLoop):
         return weighted_loss
 
 
+class SharedNegativeSampler(NegativeSampler):
+    """
+    Negative sampler that shares one draw of corrupting entities across the whole batch.
+    
+    Every positive triple is corrupted with the same num_negs_per_pos entities (heads for
+    the first half, tails for the rest), skipping the triple's own entity. The negatives
+    are still scored per triple; sharing only makes the gathered embedding rows repeat.
+    Because the negatives are correlated within a batch, this changes the training
+    objective compared with the basic sampler and is therefore opt-in.
+    """
+    
+    def corrupt_batch(self, positive_batch: MappedTriples) -> MappedTriples:
+        """
+        Corrupt a batch of positive triples with shared negative entities.
+        
+        Args:
+            positive_batch: Tensor of shape (*batch_shape, 3) with positive triples
+            
+        Returns:
+            Tensor of shape (*batch_shape, num_negs_per_pos, 3) with negative triples
+        """
+        batch_shape = positive_batch.shape[:-1]
+        negative_batch = positive_batch.view(-1, 1, 3).repeat(1, self.num_negs_per_pos, 1)
+        
+        # One draw of replacement entities for the whole batch, from all entities but one
+        entity_ids = torch.randint(self.num_entities - 1, size=(self.num_negs_per_pos,), device=positive_batch.device)
+        num_head_corruptions = self.num_negs_per_pos // 2
+        head_ids = entity_ids[:num_head_corruptions].unsqueeze(0)
+        tail_ids = entity_ids[num_head_corruptions:].unsqueeze(0)
+        positives = positive_batch.view(-1, 3)
+        # Skip over each triple's own entity, so no corruption reproduces the positive
+        # and the draw stays uniform over the other entities
+        negative_batch[:, :num_head_corruptions, 0] = head_ids + (head_ids >= positives[:, 0:1]).long()
+        negative_batch[:, num_head_corruptions:, 2] = tail_ids + (tail_ids >= positives[:, 2:3]).long()
+        
+        return negative_batch.view(*batch_shape, self.num_negs_per_pos, 3)
+
+
 def create_weighted_training_loop(
     model,
     triples_factory,
-    triple_weights: Dict[Tuple[int, int, int], float],
+    weighted_triples: torch.LongTensor,
+    triple_weights: torch.FloatTensor,
     weight_scale: float = 5.0,
     negative_sampler: str = "basic",
     negative_sampler_kwargs: Optional[Dict[str, Any]] = None,
@@ -147,7 +220,8 @@ def create_weighted_training_loop(
     Args:
         model: The PyKEEN model to train
         triples_factory: The triples factory containing training data
-        triple_weights: Dictionary mapping triples to weights
+        weighted_triples: Tensor of shape (n, 3) with the triples that have a weight
+        triple_weights: Tensor of shape (n,) with the weight of each weighted triple
         weight_scale: Scale factor for weights
         negative_sampler: Type of negative sampler to use
         negative_sampler_kwargs: Additional arguments for negative sampler
@@ -167,6 +241,7 @@ def create_weighted_training_loop(
     training_loop = WeightedSLCWATrainingLoop(
         model=model,
         triples_factory=triples_factory,
+        weighted_triples=weighted_triples,
         triple_weights=triple_weights,
         weight_scale=weight_scale,
         negative_sampler=negative_sampler,
@@ -29,8 +29,8 @@ def get_config(key, default=None):
     }
     return configs.get(key, default)
 
-def get_recommendations(properties: List[str], api_url: str = None) -> List[Dict[str, Any]]:
-    """Get property recommendations from the API."""
+def get_recommendations(properties: List[str], api_url: str = None, session: requests.Session = None) -> List[Dict[str, Any]]:
+    """Get property recommendations from the API, reusing the session's connections if given."""
     api_url = api_url or get_config('api.url')
     api_timeout = get_config('api.timeout')
     
@@ -40,7 +40,8 @@ def get_recommendations(properties: List[str], api_url: str = None) -> List[Dict
             "types": []  # Empty list as we're not using types
         }
         
-        response = requests.post(
+        post = session.post if session is not None else requests.post
+        response = post(
             api_url,
             json=data,
             timeout=api_timeout
@@ -144,27 +145,29 @@ def analyze_recommendations(num_entities: int = None):
     unique_labels_in_test = set()
     
     # Process each entity and its properties
-    for head_id, properties in sorted_entities:
-        # Get recommendations for all properties of this entity
-        property_list = list(properties)
-        print(f"\nGetting recommendations for entity {head_id} (has {len(properties)} properties)")
-        recommendations = get_recommendations(property_list)
-        filtered_recommendations = process_recommendations(recommendations)
-        
-        # Update entity statistics
-        entity_stats[head_id]['total'] = len(filtered_recommendations)
-        
-        # Check each recommendation against test set
-        for new_prop, probability in filtered_recommendations:
-            total_recommendations += 1
-            unique_recommended_labels.add(new_prop)
+    # (one keep-alive session, so the API calls reuse the same connection)
+    with requests.Session() as session:
+        for head_id, properties in sorted_entities:
+            # Get recommendations for all properties of this entity
+            property_list = list(properties)
+            print(f"\nGetting recommendations for entity {head_id} (has {len(properties)} properties)")
+            recommendations = get_recommendations(property_list, session=session)
+            filtered_recommendations = process_recommendations(recommendations)
+            
+            # Update entity statistics
+            entity_stats[head_id]['total'] = len(filtered_recommendations)
             
-            if new_prop in test_relations:
-                found_in_test.append((new_prop, probability, test_relations[new_prop]))
-                entity_stats[head_id]['found'] += 1
-                unique_labels_in_test.add(new_prop)
-            else:
-                not_in_test.append((new_prop, probability))
+            # Check each recommendation against test set
+            for new_prop, probability in filtered_recommendations:
+                total_recommendations += 1
+                unique_recommended_labels.add(new_prop)
+                
+                if new_prop in test_relations:
+                    found_in_test.append((new_prop, probability, test_relations[new_prop]))
+                    entity_stats[head_id]['found'] += 1
+                    unique_labels_in_test.add(new_prop)
+                else:
+                    not_in_test.append((new_prop, probability))
     
     # Print overall results
     print("\n=== Overall Results ===")